@@ -1,30 +1,27 @@
 import json
-import requests
 
-with open("config.json", "r") as f:
-    config = json.load(f)
+from ataix_client import Lazy, create_client
+from ataix_log import setup_logging
 
-API_KEY = config["api_key"]
-BASE_URL = "https://api.ataix.kz"
+# Константы
+CONFIG_FILE = "config.json"
+
+def load_config():
+    """Читает API-ключ из config.json и настраивает логирование"""
+    with open(CONFIG_FILE, "r") as f:
+        config = json.load(f)
+    setup_logging(config)
+    return config["api_key"]
+
+# Общий клиент API с пулом соединений; создается при первом запросе
+client = Lazy(lambda: create_client(load_config()))
 
 def get_request(endpoint):
-    """Функция для выполнения GET-запросов к API"""
-    url = f"{BASE_URL}{endpoint}"
-    headers = {
-        "API-KEY": API_KEY,
-        "Content-Type": "application/json"
-    }
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return f"Ошибка: {response.status_code}, {response.text}"
-    except requests.exceptions.Timeout:
-        return "Ошибка: Превышено время ожидания ответа от сервера"
-    except requests.exceptions.RequestException as e:
-        return f"Ошибка запроса: {e}"
+    """Функция для выполнения GET-запросов к API (справочники отдаются из кэша)"""
+    response = client.get(endpoint)
+    if response is None:
+        return "Ошибка: не удалось получить ответ от API"
+    return response
 
 def get_currencies():
     """Список всех валют"""
@@ -1,13 +1,19 @@
+import argparse
 import json
-import re
-import requests
 import sys
-import os
+from concurrent.futures import ThreadPoolExecutor
+
+from ataix_client import Lazy, check_permissions, create_client
+from ataix_log import get_logger, setup_logging, Truncated
+from market import MarketSnapshot
+from order_model import Order, fmt_number
+from order_store import OrderStore
+from precision import PrecisionTable, apply_pct, wire
 
 # Константы
 CONFIG_FILE = "config.json"
-ORDERS_FILE = "orders_data.json"
-BASE_URL = "https://api.ataix.kz"
+
+log = get_logger("buy")
 
 # Загрузка API-ключа
 def load_config():
@@ -15,64 +21,30 @@ def load_config():
     try:
         with open(CONFIG_FILE, "r") as f:
             config = json.load(f)
+            setup_logging(config)
             api_key = config.get("api_key")
             if not api_key:
                 print("Ошибка: API-ключ не найден в config.json")
                 sys.exit(1)
-            print("[DEBUG] API-ключ успешно загружен")
+            log.debug("API-ключ успешно загружен")
             return api_key
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Ошибка загрузки конфигурации: {e}")
         sys.exit(1)
 
-API_KEY = load_config()
-
-# Класс для работы с API
-class AtaixAPI:
-    headers = {
-        "accept": "application/json",
-        "X-API-Key": API_KEY
-    }
+# Общий клиент API с пулом соединений и хранилище отслеживаемых ордеров.
+# Создаются при первом обращении: импорт модуля не читает config.json и не ходит в сеть
+AtaixAPI = Lazy(lambda: create_client(load_config()))
+store = Lazy(OrderStore)
 
-    @staticmethod
-    def get(endpoint):
-        """Выполняет GET-запрос к API и выводит отладочную информацию."""
-        try:
-            print(f"[DEBUG] GET-запрос к {BASE_URL}{endpoint}")
-            response = requests.get(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса: {e}")
-            return None
-
-    @staticmethod
-    def post(endpoint, data):
-        """Выполняет POST-запрос к API и выводит отладочную информацию."""
-        headers = AtaixAPI.headers.copy()
-        headers["Content-Type"] = "application/json"
-        try:
-            print(f"[DEBUG] POST-запрос к {BASE_URL}{endpoint} с данными: {data}")
-            response = requests.post(f"{BASE_URL}{endpoint}", headers=headers, json=data, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка при отправке запроса: {e}")
-            return None
+# Шаги цены и количества пар из /api/symbols
+precision = Lazy(lambda: PrecisionTable(AtaixAPI))
 
 # Проверка прав доступа API
-def check_api_permissions():
-    """Проверяет доступные права API."""
+def check_api_permissions(force=False):
+    """Проверяет доступные права API (результат кэшируется на диске на сутки)."""
     print("\n[INFO] Проверка прав API...")
-    response = AtaixAPI.get("/api/user/info")  # Пример запроса к API для проверки
+    response = check_permissions(AtaixAPI, force=force)
     if response and isinstance(response, dict):
         print("[INFO] API подключен. Доступные права:")
         for key, value in response.items():
@@ -80,22 +52,21 @@ def check_api_permissions():
     else:
         print("[ERROR] Не удалось получить информацию о правах API.")
 
-# Вызываем проверку API после загрузки
-check_api_permissions()
-
 
 # Функции обработки данных
-def extract_values(text, key):
-    """Извлекает значения по ключу из JSON-данных"""
-    return re.findall(rf'"{key}":\s*"([^"]+)"', text)
+def get_market_snapshot(with_prices=True):
+    """Загружает снимок рынка: пары из /api/symbols и, при необходимости, цены из /api/prices"""
+    symbols_data = AtaixAPI.get("/api/symbols")
+    prices_data = AtaixAPI.get("/api/prices") if with_prices else None
+    return MarketSnapshot.from_api(symbols_data, prices_data)
 
 def get_trading_pairs():
     """Возвращает список всех торговых пар"""
-    return extract_values(json.dumps(AtaixAPI.get("/api/symbols")), "symbol")
+    return get_market_snapshot(with_prices=False).pairs()
 
 def get_prices():
-    """Возвращает список всех цен"""
-    return extract_values(json.dumps(AtaixAPI.get("/api/prices")), "lastTrade")
+    """Возвращает последние цены по торговым парам"""
+    return get_market_snapshot().prices()
 
 def get_balances():
     """Получает баланс всех валют и выводит его в удобном формате"""
@@ -104,25 +75,17 @@ def get_balances():
     print(f"{'Валюта':<10} {'Баланс':>15}")
     print("-" * 30)
 
-    symbols_data = AtaixAPI.get("/api/symbols")
-    if not isinstance(symbols_data, dict):
+    currencies = get_market_snapshot(with_prices=False).bases()
+    if not currencies:
         print("Ошибка получения списка валют.")
         return
 
-    currencies = set(extract_values(json.dumps(symbols_data), "base"))
-
-    for currency in currencies:
-        balance_info = requests.get(
-            f"{BASE_URL}/api/user/balances/{currency}",
-            headers={
-                "X-API-Key": API_KEY,
-                "Accept": "application/json"
-            },
-            timeout=10
-        ).json()
+    # Балансы запрашиваются параллельно (или одним запросом, если биржа это позволяет)
+    balances = AtaixAPI.get_balances(currencies)
 
+    for currency, balance_info in balances.items():
         # Отладочный вывод
-        print(f"DEBUG: Ответ API для {currency} -> {balance_info}")
+        log.debug("Ответ API для %s -> %s", currency, Truncated(balance_info))
 
         if isinstance(balance_info, dict) and balance_info.get("status") is True and "available" in balance_info:
             try:
@@ -137,9 +100,7 @@ def get_balances():
 
 # Получение списка пар
 def get_low_price_pairs(price_limit):
-    pairs = get_trading_pairs()
-    prices = get_prices()
-    low_price_pairs = {pairs[i]: float(prices[i]) for i in range(len(pairs)) if "USDT" in pairs[i] and float(prices[i]) <= price_limit}
+    low_price_pairs = get_market_snapshot().low_price_pairs("USDT", price_limit)
 
     print(f"\n\nТорговые пары с USDT, где цена ≤ {price_limit} USDT:")
     for pair, price in low_price_pairs.items():
@@ -189,8 +150,9 @@ def select_quantity():
 
 
 # Рассчет цены для ордера
-def calculate_order_price(price, discount):
-    return round(price * (1 - discount / 100), 4)
+def calculate_order_price(price, discount, pair):
+    """Цена со скидкой discount %, приведенная к шагу цены пары pair/USDT."""
+    return precision.price(f"{pair}/USDT", apply_pct(price, -discount))
 
 # Подтверждение покупки
 def confirm_purchase(pair, price, quantity):
@@ -208,30 +170,28 @@ def confirm_purchase(pair, price, quantity):
 # Создание ордера
 def create_orders(pair, price, quantity):
     """Создает ордер на покупку по заданной цене и количеству."""
-    print(f"DEBUG: Создание ордера -> пара: {pair}/USDT, цена: {price} USDT, кол-во: {quantity}")
+    log.debug("Создание ордера -> пара: %s/USDT, цена: %s USDT, кол-во: %s", pair, price, quantity)
+
+    # Цена и количество приводятся к шагам пары до отправки: биржа не отклонит ордер из-за точности
+    price, quantity, error = precision.prepare(f"{pair}/USDT", price, quantity)
+    if error:
+        print(f"Ошибка при создании ордера {pair}/USDT: {error}.")
+        return None
 
     order_data = {
         "symbol": f"{pair}/USDT",
         "side": "buy",
         "type": "limit",
-        "quantity": quantity,
-        "price": price
+        "quantity": wire(quantity),
+        "price": wire(price)
     }
 
     response = AtaixAPI.post("/api/orders", order_data)
 
-    print(f"DEBUG: Ответ API -> {response}")
-
-    if isinstance(response, dict) and "result" in response:
-        return {
-            "orderID": response["result"]["orderID"],
-            "price": response["result"]["price"],
-            "quantity": response["result"]["quantity"],
-            "symbol": response["result"]["symbol"],
-            "created": response["result"]["created"],
-            "status": response["result"].get("status", "NEW"),
-            "cumCommission": response["result"].get("cumCommission", "0")  # << вот сюда добавляем
-        }
+    log.debug("Ответ API -> %s", Truncated(response))
+
+    if isinstance(response, dict) and isinstance(response.get("result"), dict):
+        return Order.from_api(response["result"])  # originalID нового ордера совпадает с orderID
     else:
         print("Ошибка при создании ордера.")
         return None
@@ -239,33 +199,34 @@ def create_orders(pair, price, quantity):
 
 
 
-# Сохранение ордера в файл
+# Строка history.txt о выставленном ордере, включая cumCommission
+def format_history_line(order):
+    return (
+        f"\nВЫСТАВЛЕН ОРДЕР НА ПОКУПКУ:  OrderID {order.order_id}, "
+        f"цена {fmt_number(order.price)}, кол-во {fmt_number(order.quantity)}, "
+        f"символ {order.symbol}, время {order.created}, "
+        f"originalID {order.original_id}, комиссия {fmt_number(order.cum_commission)}\n\n"
+    )
+
+
+# Сохранение ордера в хранилище
 def save_order(order):
-    existing_orders = []
-    if os.path.exists(ORDERS_FILE):
-        with open(ORDERS_FILE, "r") as file:
-            try:
-                existing_orders = json.load(file)
-            except json.JSONDecodeError:
-                pass
+    store.add(order)
 
-    # Добавляем originalID
-    order["originalID"] = order["orderID"]
+    print(f"[+] Ордер успешно создан и сохранён в {store.path}. Проверьте его на ATAIX во вкладке 'Мои ордера'.")
 
-    with open(ORDERS_FILE, "w") as file:
-        json.dump(existing_orders + [order], file, indent=4)
+    with open("history.txt", "a", encoding="utf-8") as history_file:
+        history_file.write(format_history_line(order))
 
-    print(f"[+] Ордер успешно создан и сохранён в {ORDERS_FILE}. Проверьте его на ATAIX во вкладке 'Мои ордера'.")
 
-    # Запись в history.txt, включая cumCommission
-    history_line = (
-        f"\nВЫСТАВЛЕН ОРДЕР НА ПОКУПКУ:  OrderID {order['orderID']}, "
-        f"цена {order['price']}, кол-во {order['quantity']}, "
-        f"символ {order['symbol']}, время {order['created']}, "
-        f"originalID {order['originalID']}, комиссия {order.get('cumCommission', '0')}\n\n"
-    )
+# Сохранение пачки ордеров одной транзакцией и одной записью в history.txt
+def save_orders(orders):
+    store.add_many(orders)
+
     with open("history.txt", "a", encoding="utf-8") as history_file:
-        history_file.write(history_line)
+        history_file.write("".join(format_history_line(order) for order in orders))
+
+    print(f"[+] Сохранено ордеров: {len(orders)} в {store.path}. Проверьте их на ATAIX во вкладке 'Мои ордера'.")
 
 
 def input_price_limit():
@@ -290,7 +251,11 @@ def main():
     pair, current_price = select_pair(low_price_pairs)
     discount = select_discount()
     quantity = select_quantity()
-    order_price = calculate_order_price(current_price, discount)
+    order_price, quantity, error = precision.prepare(
+        f"{pair}/USDT", calculate_order_price(current_price, discount, pair), quantity)
+    if error:
+        print(f"[ERROR] Ордер не может быть выставлен: {error}.")
+        return
 
     if confirm_purchase(pair, order_price, quantity):
         order = create_orders(pair, order_price, quantity)
@@ -301,7 +266,111 @@ def main():
 
 
 
+# Пакетный режим: лестница ордеров по нескольким парам и уровням скидки
+def load_ladder_spec(spec_file):
+    """Читает спецификацию лестницы из JSON-файла.
+
+    Формат: {"discounts": [1, 2, 3],
+             "positions": [{"pair": "BTC", "quantity": 0.001},
+                           {"pair": "ETH", "quantity": 0.01, "discounts": [0.5, 1]}]}
+    Уровни discounts у позиции заменяют общие.
+    """
+    with open(spec_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    default_discounts = spec.get("discounts", [0])
+    return [
+        (str(p["pair"]).upper(), float(p["quantity"]), [float(d) for d in p.get("discounts", default_discounts)])
+        for p in spec.get("positions", [])
+    ]
+
+
+def build_ladder(positions):
+    """Рассчитывает цены всех ордеров лестницы по одному снимку рынка.
+
+    positions - список (пара, количество, [скидки, %]); возвращает список
+    (пара, цена, количество) с ценой и количеством по шагам пары и печатает
+    пропущенные позиции: без цены или не проходящие ограничения пары.
+    """
+    prices = get_market_snapshot().prices()
+    ladder = []
+    for pair, quantity, discounts in positions:
+        current_price = prices.get(f"{pair}/USDT")
+        if current_price is None:
+            print(f"[ERROR] Нет цены для пары {pair}/USDT, позиция пропущена.")
+            continue
+        for discount in discounts:
+            if not 0 <= discount <= 100:
+                print(f"[ERROR] Скидка {discount}% для {pair} вне диапазона 0-100, уровень пропущен.")
+                continue
+            price, level_quantity, error = precision.prepare(
+                f"{pair}/USDT", calculate_order_price(current_price, discount, pair), quantity)
+            if error:
+                print(f"[ERROR] Уровень {discount}% для {pair} пропущен: {error}.")
+                continue
+            ladder.append((pair, price, level_quantity))
+    return ladder
+
+
+def place_ladder(ladder):
+    """Выставляет ордера параллельно (в пределах лимита частоты клиента) и сохраняет одной транзакцией."""
+    with ThreadPoolExecutor(max_workers=min(AtaixAPI.max_workers, len(ladder))) as pool:
+        results = list(pool.map(lambda item: create_orders(*item), ladder))
+
+    created = [order for order in results if order]
+    failed = [item for item, order in zip(ladder, results) if not order]
+    if created:
+        save_orders(created)
+    for pair, price, quantity in failed:
+        print(f"[ERROR] Не удалось создать ордер {pair}/USDT: цена {price}, кол-во {quantity}")
+    return created
+
+
+def run_batch(positions, assume_yes=False):
+    ladder = build_ladder(positions)
+    if not ladder:
+        print("Нет ордеров для выставления.")
+        return []
+
+    print(f"\n{'Пара':<12} {'Цена':>14} {'Кол-во':>14} {'Сумма USDT':>14}")
+    print("-" * 57)
+    for pair, price, quantity in ladder:
+        print(f"{pair + '/USDT':<12} {price:>14} {quantity:>14} {round(price * quantity, 4):>14}")
+    print("-" * 57)
+    print(f"Ордеров: {len(ladder)}, итого: {round(sum(p * q for _, p, q in ladder), 4)} USDT")
+
+    if not assume_yes:
+        print('Если согласны, напишите "yes"')
+        if input("--> ").strip().lower() != "yes":
+            print("Отменено.")
+            return []
+    return place_ladder(ladder)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Покупка: интерактивно или пакетом по лестнице скидок")
+    parser.add_argument("--spec", help="JSON-файл со спецификацией лестницы")
+    parser.add_argument("--pairs", help="пары через запятую, например BTC,ETH")
+    parser.add_argument("--quantity", type=float, help="количество для каждого ордера (с --pairs)")
+    parser.add_argument("--discounts", default="0", help="уровни скидки в %% через запятую, например 1,2,3")
+    parser.add_argument("--yes", action="store_true", help="не спрашивать подтверждение")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    check_api_permissions()
+    if args.spec or args.pairs:
+        if args.spec:
+            positions = load_ladder_spec(args.spec)
+        elif args.quantity is None or args.quantity <= 0:
+            sys.exit("Ошибка! Для --pairs нужно положительное --quantity.")
+        else:
+            discounts = [float(d) for d in args.discounts.split(",") if d.strip()]
+            positions = [(p.strip().upper(), args.quantity, discounts) for p in args.pairs.split(",") if p.strip()]
+        run_batch(positions, args.yes)
+        AtaixAPI.print_stats()
+        sys.exit()
+
     while True:
         main()
         user_input = input('\nВведите "start" чтобы запустить снова или "exit" чтобы выйти: ').strip().lower()
@@ -313,3 +382,6 @@ if __name__ == "__main__":
         else:
             print('Выход из программы.')
             break
+
+    # Статистика задержек по эндпоинтам за сессию
+    AtaixAPI.print_stats()
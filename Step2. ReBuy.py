@@ -1,118 +1,81 @@
 import json
-import requests
 import sys
 
+from ataix_client import Lazy, create_client
+from ataix_log import get_logger, setup_logging
+from metrics import ScanMetrics, observe_fill
+from history_index import HistoryIndex
+from order_ops import commit_replacements, replace_orders
+from order_model import Order, fmt_number, parse_time
+from order_poller import iter_order_statuses
+from order_store import OrderStore
+from precision import UP, PrecisionTable, apply_pct, wire
+from reconcile import fetch_snapshot
+
 # Константы
 CONFIG_FILE = "config.json"
-ORDERS_FILE = "orders_data.json"
 HISTORY_FILE = "history.txt"
-BASE_URL = "https://api.ataix.kz"
+
+log = get_logger("rebuy")
 
 # Загрузка API-ключа
 def load_config():
     try:
         with open(CONFIG_FILE, "r", encoding="utf-8") as f:
             config = json.load(f)
+            setup_logging(config)
             api_key = config.get("api_key")
             if not api_key:
                 print("Ошибка: API-ключ не найден в config.json")
                 sys.exit(1)
-            print("[DEBUG] API-ключ успешно загружен")
+            log.debug("API-ключ успешно загружен")
             return api_key
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Ошибка загрузки конфигурации: {e}")
         sys.exit(1)
 
-API_KEY = load_config()
+# Общий клиент API с пулом соединений и хранилище отслеживаемых ордеров.
+# Создаются при первом обращении: импорт модуля не читает config.json и не ходит в сеть
+AtaixAPI = Lazy(lambda: create_client(load_config()))
+store = Lazy(OrderStore)
 
-# Класс для работы с API
-class AtaixAPI:
-    headers = {
-        "accept": "application/json",
-        "X-API-Key": API_KEY
-    }
+# Шаги цены и количества пар из /api/symbols
+precision = Lazy(lambda: PrecisionTable(AtaixAPI))
 
-    @staticmethod
-    def get(endpoint):
-        try:
-            print(f"[DEBUG] GET-запрос к {BASE_URL}{endpoint}")
-            response = requests.get(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса: {e}")
-            return None
-
-    @staticmethod
-    def delete(endpoint):
-        try:
-            print(f"[DEBUG] DELETE-запрос к {BASE_URL}{endpoint}")
-            response = requests.delete(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешное удаление ордера: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка удаления ордера: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса на удаление: {e}")
-            return None
-
-    @staticmethod
-    def post(endpoint, data):
-        try:
-            print(f"[DEBUG] POST-запрос к {BASE_URL}{endpoint} с данными: {data}")
-            response = requests.post(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, json=data, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса на создание ордера: {e}")
-            return None
+# Индекс записанных событий для проверки дубликатов в history.txt
+history_index = Lazy(lambda: HistoryIndex(HISTORY_FILE))
 
 # Вспомогательные функции
 def write_to_history(order, action="ПЕРЕЗАПУСК Buy: ", no_lowering=False):
     try:
-        order_id = order.get('orderID') or order.get('id')
-        original_id = order.get('originalID') or order_id
+        order_id = order.order_id
+        original_id = order.original_id or order_id
 
         # Проверяем только для "ПОКУПКА:"
-        if action.strip().startswith("ПОКУПКА"):
-            try:
-                with open(HISTORY_FILE, "r", encoding="utf-8") as file:
-                    history_lines = file.readlines()
-
-                for line in history_lines:
-                    if f"ПОКУПКА:  OrderID {order_id}" in line:
-                        print(f"[INFO] Ордер {order_id} уже записан в history.txt. Пропускаем запись.")
-                        return  # Уже записан — выходим
-            except FileNotFoundError:
-                # Файл может отсутствовать — это нормально
-                pass
-
-        price_to_record = order.get('price')
-        commission = order.get('cumCommission', '0')
+        check_duplicate = action.strip().startswith("ПОКУПКА")
+        if check_duplicate and history_index.contains(action, order_id):
+            print(f"[INFO] Ордер {order_id} уже записан в history.txt. Пропускаем запись.")
+            return  # Уже записан — выходим
+
+        price_to_record = order.price
+        commission = order.cum_commission
 
         with open(HISTORY_FILE, "a", encoding="utf-8") as file:
             log_line = (
                 f"{action} OrderID {order_id}, "
-                f"цена {price_to_record}, "
-                f"кол-во {order['quantity']}, "
-                f"символ {order['symbol']}, "
-                f"время {order['created']}, "
+                f"цена {fmt_number(price_to_record)}, "
+                f"кол-во {fmt_number(order.quantity)}, "
+                f"символ {order.symbol}, "
+                f"время {order.created}, "
                 f"originalID {original_id}, "
-                f"комиссия {commission}\n"
+                f"комиссия {fmt_number(commission)}\n"
             )
             file.write(log_line)
 
-        print(f"[DEBUG] Ордер {order_id} записан в history.txt с ценой {price_to_record} и комиссией {commission}.")
+        if check_duplicate:
+            history_index.add(action, order_id)
+
+        log.debug("Ордер %s записан в history.txt с ценой %s и комиссией %s.", order_id, price_to_record, commission)
     except Exception as e:
         print(f"[ERROR] Ошибка при записи в history.txt: {e}")
 
@@ -132,30 +95,24 @@ def write_to_history(order, action="ПЕРЕЗАПУСК Buy: ", no_lowering=Fal
 
 def update_order_status(order_id, status, updated_data=None):
     try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
-
-        for order in orders:
-            if order["orderID"] == order_id:
-                old_status = order["status"]
-                order["status"] = status
-
-                if status == "filled" and old_status != "filled":
-                    if updated_data:
-                        # Обновляем ордер актуальными данными из API
-                        order["cumCommission"] = updated_data.get("cumCommission", order.get("cumCommission", "0"))
-                        order["price"] = updated_data.get("averagePrice", order.get("price"))
-                        order["created"] = updated_data.get("created", order.get("created"))
-                        order["quantity"] = updated_data.get("cumQuantity", order.get("quantity"))  # если нужно
-
-                    write_to_history(order, action="\nПОКУПКА: ", no_lowering=True)
-
-                print(f"[DEBUG] Обновлен статус ордера {order_id} на {status}")
-                break
-
-        with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-            json.dump(orders, file, indent=4, ensure_ascii=False)
-        print(f"[DEBUG] Статус и данные ордера {order_id} успешно обновлены в файле.")
+        order = store.get(order_id)
+        if order:
+            old_status = order.status
+            order.status = status
+
+            if status == "filled" and old_status != "filled":
+                if updated_data:
+                    # Обновляем ордер актуальными данными из API: цена и количество - фактические
+                    order.update(updated_data)
+                    order.status = status
+                    order.price = order.fill_price
+                    order.quantity = order.cum_quantity or order.quantity
+
+                write_to_history(order, action="\nПОКУПКА: ", no_lowering=True)
+
+            store.put(order)
+            log.debug("Обновлен статус ордера %s на %s", order_id, status)
+        log.debug("Статус и данные ордера %s успешно обновлены в хранилище.", order_id)
     except Exception as e:
         print(f"[ERROR] Ошибка при обновлении статуса ордера: {e}")
 
@@ -164,47 +121,37 @@ def update_order_status(order_id, status, updated_data=None):
 
 def remove_order(order_id):
     try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
-
-        orders = [order for order in orders if order["orderID"] != order_id]
-
-        with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-            json.dump(orders, file, indent=4, ensure_ascii=False)
-
-        print(f"[DEBUG] Ордер {order_id} удален из orders_data.json.")
+        store.remove(order_id)
+        log.debug("Ордер %s удален из хранилища ордеров.", order_id)
     except Exception as e:
         print(f"[ERROR] Ошибка при удалении ордера: {e}")
 
 def create_orders(pair, price, quantity, original_id=None):
-    print(f"DEBUG: Создание ордера -> пара: {pair}, цена: {price} USDT, кол-во: {quantity}")
+    log.debug("Создание ордера -> пара: %s, цена: %s USDT, кол-во: %s", pair, price, quantity)
+
+    price, quantity, error = precision.prepare(pair, price, quantity)
+    if error:
+        print(f"Ошибка при создании ордера {pair}: {error}.")
+        return None
 
     order_data = {
         "symbol": pair,
         "side": "buy",
         "type": "limit",
-        "quantity": quantity,
-        "price": price
+        "quantity": wire(quantity),
+        "price": wire(price)
     }
 
     response = AtaixAPI.post("/api/orders", order_data)
 
-    if isinstance(response, dict) and "result" in response:
-        result = response["result"]
-        new_order = {
-            "orderID": result["orderID"],
-            "price": result["price"],
-            "quantity": result["quantity"],
-            "symbol": result["symbol"],
-            "created": result["created"],
-            "status": result.get("status", "NEW"),
-            "originalID": original_id if original_id else result["orderID"],
-            "cumCommission": result.get("cumCommission", "0")  # <---- Теперь всегда добавляем
-        }
+    if isinstance(response, dict) and isinstance(response.get("result"), dict):
+        new_order = Order.from_api(response["result"])
+        if original_id:
+            new_order.original_id = original_id
 
         # Если сразу выполнен, пишем в историю
-        if new_order["status"].lower() == "filled":
-            new_order["price"] = result.get("averagePrice", new_order["price"])
+        if new_order.status == "filled":
+            new_order.price = new_order.fill_price
             write_to_history(new_order, action="\nПОКУПКА: ", no_lowering=True)
 
         return new_order
@@ -213,6 +160,14 @@ def create_orders(pair, price, quantity, original_id=None):
         return None
 
 
+def create_replacement(order, new_price):
+    """Выставляет замену ордера по новой цене с тем же originalID."""
+    new_order = create_orders(order.symbol, new_price, order.quantity, order.original_id)
+    if new_order:
+        new_order.reprice_count = order.reprice_count + 1
+    return new_order
+
+
 
 
 
@@ -221,34 +176,45 @@ def create_orders(pair, price, quantity, original_id=None):
 
 
 # Основная функция
-def scan_orders():
+def scan_orders(rule=None):
+    """Проверяет ордера на покупку и пересоздает неисполненные.
+
+    Без rule каждое пересоздание подтверждается вводом "yes" и цена
+    повышается на 1%; с rule (RepriceRule) решения принимаются автоматически.
+    """
+    scan = ScanMetrics("rebuy")
     try:
-        # Открываем файл ордеров
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
+        # Загружаем отслеживаемые ордера
+        orders = store.all()
 
         orders_to_restart = []
+        orders_to_check = {}
 
-        # Обрабатываем каждый ордер из списка
+        # Отбираем ордера, статус которых нужно запросить
         for order in orders:
-            order_id = order["orderID"]
-            side = order.get("side", "buy")
-            status = order.get("status", "").lower()
+            order_id = order.order_id
+            side = order.side
+            status = order.status
 
             # Если ордер уже выполнен, пропускаем его
             if status == "filled":
                 print(f"[INFO] Ордер {order_id} уже выполнен (filled). Пропускаем проверку.")
                 continue
 
-            print(f"[INFO] Проверяем ордер с ID: {order_id}, side: {side}")
-
             # Пропускаем ордера на продажу
-            if side.lower() == "sell":
+            if side == "sell":
                 print(f"[INFO] Ордер {order_id} на продажу (sell). Пропускаем.")
                 continue
 
-            # Запрашиваем актуальный статус ордера
-            order_status_response = AtaixAPI.get(f"/api/orders/{order_id}")
+            print(f"[INFO] Проверяем ордер с ID: {order_id}, side: {side}")
+            orders_to_check[order_id] = order
+
+        scan.checked = len(orders_to_check)
+        # Статусы берутся из постраничного списка ордеров биржи; ордера, которых
+        # в нем нет, запрашиваются параллельно и обрабатываются по мере получения
+        snapshot = fetch_snapshot(AtaixAPI, orders_to_check.values()) if orders_to_check else None
+        for order_id, order_status_response in iter_order_statuses(AtaixAPI, orders_to_check, snapshot=snapshot):
+            order = orders_to_check[order_id]
             if order_status_response:
                 status_from_api = order_status_response.get("result", {}).get("status")
                 if status_from_api:
@@ -256,10 +222,14 @@ def scan_orders():
                     if status_from_api == "filled":
                         print(f"[INFO] Ордер {order_id} выполнен (filled). Обновляем статус.")
                         update_order_status(order_id, "filled", updated_data=order_status_response["result"])
-                        write_to_history(order_status_response["result"], action="\nПОКУПКА: ", no_lowering=True)
+                        scan.filled += 1
+                        observe_fill("buy", parse_time(order.created), parse_time(order_status_response["result"].get("updated")))
+                        write_to_history(Order.from_api(order_status_response["result"]), action="\nПОКУПКА: ", no_lowering=True)
                     # Если ордер новый, добавляем в список для пересоздания
                     elif status_from_api == "new":
                         print(f"[INFO] Ордер {order_id} не выполнен (new). Готовим к отмене и пересозданию.")
+                        # Актуальные данные уже получены - повторный GET перед отменой не нужен
+                        order.update(order_status_response["result"])
                         orders_to_restart.append(order)
                     else:
                         print(f"[INFO] Ордер {order_id} в статусе {status_from_api}. Статус не изменяем.")
@@ -268,71 +238,51 @@ def scan_orders():
             else:
                 print(f"[ERROR] Ошибка при получении статуса ордера {order_id}.")
 
-        # Обрабатываем ордера, которые нужно пересоздать
-        if orders_to_restart:
-            for order in orders_to_restart:
-                print(f"\n[ВНИМАНИЕ] Найден ордер для отмены и пересоздания: {order['orderID']} (пара {order['symbol']}, цена {order['price']}, кол-во {order['quantity']})")
+        # 1. Отбираем ордера для пересоздания и рассчитываем новые цены
+        replacements = []
+        for order in orders_to_restart:
+            print(f"\n[ВНИМАНИЕ] Найден ордер для отмены и пересоздания: {order.order_id} (пара {order.symbol}, цена {order.price}, кол-во {order.quantity})")
+            if rule is None:
                 user_input = input("Введите 'yes' чтобы подтвердить пересоздание этого ордера: ").strip().lower()
-                if user_input == "yes":
-                    order_id = order["orderID"]
-
-                    # 1. Запрашиваем актуальные данные ордера
-                    order_status_response = AtaixAPI.get(f"/api/orders/{order_id}")
-                    if order_status_response and "result" in order_status_response:
-                        result = order_status_response["result"]
-
-                        # 2. Обновляем ордер локально в orders_data актуальными данными из API
-                        try:
-                            with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-                                orders_data = json.load(file)
-
-                            for o in orders_data:
-                                if o["orderID"] == order_id:
-                                    o.update(result)  # Обновляем ордер с новыми данными из API
-                                    break
-
-                            # 3. Записываем обновленные данные обратно в файл
-                            with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-                                json.dump(orders_data, file, indent=4, ensure_ascii=False)
-
-                            print(f"[DEBUG] Ордер {order_id} обновлен актуальными данными перед перезапуском.")
-                        except Exception as e:
-                            print(f"[ERROR] Ошибка при обновлении ордера {order_id}: {e}")
-
-                        # 4. Обновляем ордер локально для записи в историю
-                        order.update(result)  # Обновляем данные ордера перед записью в историю
-
-                    # 5. Пишем в историю
-                    write_to_history(order, action="ПЕРЕЗАПУСК Buy: ")
-
-                    # 6. Удаляем ордер
-                    delete_response = AtaixAPI.delete(f"/api/orders/{order_id}")
-                    if delete_response:
-                        remove_order(order_id)
-
-                        # 7. Пересоздаем ордер с новой ценой
-                        price = float(order["price"])
-                        quantity = float(order["quantity"])
-                        original_id = order.get("originalID", order["orderID"])
-                        new_price = round(price * 1.01, 4)  # Пересчитываем цену на 1% выше
-                        new_order = create_orders(order["symbol"], new_price, quantity, original_id)
-
-                        # 8. Обновляем файл с ордерами
-                        if new_order:
-                            with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-                                updated_orders = json.load(file)
-
-                            updated_orders.append(new_order)
-
-                            with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-                                json.dump(updated_orders, file, indent=4, ensure_ascii=False)
+                if user_input != "yes":
+                    print(f"[ОТМЕНА] Ордер {order.order_id} пропущен.")
+                    continue
+                # Цена на 1% выше, вверх до шага цены пары
+                new_price = precision.price(order.symbol, apply_pct(order.price, 1), UP)
+            else:
+                new_price, reason = rule.next_price(order)
+                if new_price is None:
+                    print(f"[ПРОПУСК] Ордер {order.order_id}: {reason}.")
+                    continue
+                if rule.dry_run:
+                    print(f"[DRY-RUN] Ордер {order.order_id} был бы пересоздан по цене {new_price}.")
+                    continue
+            replacements.append((order, new_price))
+
+        # 2. Отмена и новый ордер идут подряд (2 запроса), разные ордера - параллельно
+        results = replace_orders(AtaixAPI, replacements, create_replacement)
+
+        # 3. Пишем в историю отмененные ордера
+        for result in results:
+            order_id = result.order.order_id
+            if result.cancelled is None:
+                print(f"[ERROR] Не удалось отменить ордер {order_id}. Пересоздание отменено.")
+                continue
+            result.order.update(result.cancelled)
+            write_to_history(result.order, action="ПЕРЕЗАПУСК Buy: ")
+            if result.new_order:
+                scan.repriced += 1
+                print(f"[INFO] Ордер {order_id} заменен новым ордером {result.new_order.order_id} по цене {result.new_price}.")
+            else:
+                print(f"[ERROR] Ордер {order_id} отменен, но новый ордер не создан.")
 
-                            print(f"[INFO] Новый ордер с ID {new_order['orderID']} успешно добавлен.")
-                else:
-                    print(f"[ОТМЕНА] Ордер {order['orderID']} пропущен.")
+        # 4. Старые и новые ордера сохраняются одной транзакцией
+        commit_replacements(store, results)
 
     except Exception as e:
         print(f"[ERROR] Ошибка при сканировании ордеров: {e}")
+    finally:
+        scan.finish()
 
 
 
@@ -354,3 +304,5 @@ if __name__ == "__main__":
             print('Выход из программы.')
             break
 
+    # Статистика задержек по эндпоинтам за сессию
+    AtaixAPI.print_stats()
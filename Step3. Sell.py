@@ -1,11 +1,20 @@
+import argparse
 import json
-import requests
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from ataix_client import Lazy, create_client, read_config
+from ataix_log import get_logger, setup_logging
+from metrics import ScanMetrics
+from order_model import Order, fmt_number
+from order_store import OrderStore
+from precision import UP, PrecisionTable, apply_pct, wire
+from repricing import MarkupRule
 
 # Константы
 CONFIG_FILE = "config.json"
-ORDERS_FILE = "orders_data.json"
-BASE_URL = "https://api.ataix.kz"
+
+log = get_logger("sell")
 
 # Загрузка API-ключа
 def load_config():
@@ -13,238 +22,223 @@ def load_config():
     try:
         with open(CONFIG_FILE, "r") as f:
             config = json.load(f)
+            setup_logging(config)
             api_key = config.get("api_key")
             if not api_key:
                 print("Ошибка: API-ключ не найден в config.json")
                 sys.exit(1)
-            print("[DEBUG] API-ключ успешно загружен")
+            log.debug("API-ключ успешно загружен")
             return api_key
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Ошибка загрузки конфигурации: {e}")
         sys.exit(1)
 
-API_KEY = load_config()
-
-# Класс для работы с API
-class AtaixAPI:
-    headers = {
-        "accept": "application/json",
-        "X-API-Key": API_KEY
-    }
-
-    @staticmethod
-    def get(endpoint):
-        """Выполняет GET-запрос к API и выводит отладочную информацию."""
-        try:
-            print(f"[DEBUG] GET-запрос к {BASE_URL}{endpoint}")
-            response = requests.get(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса: {e}")
-            return None
-
-    @staticmethod
-    def post(endpoint, data):
-        """Выполняет POST-запрос для создания нового ордера."""
-        try:
-            print(f"[DEBUG] POST-запрос к {BASE_URL}{endpoint} с данными: {data}")
-            response = requests.post(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, json=data, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса на создание ордера: {e}")
-            return None
-
-# Функция для удаления ордера и записи в history.txt
-def delete_purchase_order_and_log(order_id, related_sell_order=None):
-    """Удаляет ордер на покупку и записывает в history.txt только информацию о продаже."""
-    try:
-        # Чтение данных из orders_data.json
-        with open(ORDERS_FILE, "r") as file:
-            orders = json.load(file)
-
-        # Находим ордер на покупку
-        order_to_delete = None
-        for order in orders:
-            if order["orderID"] == order_id:
-                order_to_delete = order
-                break
-
-        if order_to_delete:
-            # Удаляем ордер из списка
-            orders = [order for order in orders if order["orderID"] != order_id]
-
-            # Записываем измененные данные обратно
-            with open(ORDERS_FILE, "w") as file:
-                json.dump(orders, file, indent=4)
-
-            if related_sell_order:
-                # Только запись о продаже
-                sell_order_info = (
-                    f"OrderID {related_sell_order['orderID']}, "
-                    f"цена {related_sell_order['price']}, "
-                    f"кол-во {related_sell_order['quantity']}, "
-                    f"символ {related_sell_order['symbol']}, "
-                    f"время {related_sell_order['created']}, "
-                    f"originalID {related_sell_order.get('originalID', 'Не указан')}, "
-                    f"комиссия {related_sell_order['cumCommission']}"
-                )
-                history_entry = f"\nВыставлено на Продажу: {sell_order_info}\n"
-
-                # Запись в history.txt
-                with open("history.txt", "a", encoding="utf-8") as history_file:
-                    history_file.write(history_entry)
-
-            print(f"[DEBUG] Ордер {order_id} удален и запись о продаже добавлена в history.txt.")
-        else:
-            print(f"[INFO] Ордер с ID {order_id} не найден.")
-
-    except Exception as e:
-        print(f"[ERROR] Ошибка при удалении ордера и записи в history.txt: {e}")
-
-
-
-
-
-
-
-# Функция для обновления статуса ордера
-def update_order_status(order_id, status, file_path=ORDERS_FILE):
-    """Обновляет статус ордера."""
+# Общий клиент API с пулом соединений и хранилище отслеживаемых ордеров.
+# Создаются при первом обращении: импорт модуля не читает config.json и не ходит в сеть
+AtaixAPI = Lazy(lambda: create_client(load_config()))
+store = Lazy(OrderStore)
+
+# Шаги цены и количества пар из /api/symbols
+precision = Lazy(lambda: PrecisionTable(AtaixAPI))
+
+# Строка history.txt о выставленном ордере на продажу
+def format_sale_line(sell_order):
+    return (
+        f"\nВыставлено на Продажу: OrderID {sell_order.order_id}, "
+        f"цена {fmt_number(sell_order.price)}, "
+        f"кол-во {fmt_number(sell_order.quantity)}, "
+        f"символ {sell_order.symbol}, "
+        f"время {sell_order.created}, "
+        f"originalID {sell_order.original_id}, "
+        f"комиссия {fmt_number(sell_order.cum_commission)}\n"
+    )
+
+
+# Запись в history.txt
+def append_history(lines):
+    """Дописывает строки в history.txt одной записью."""
+    if not lines:
+        return
     try:
-        with open(file_path, "r") as file:
-            orders = json.load(file)
-
-        for order in orders:
-            if order["orderID"] == order_id:
-                order["status"] = status
-                print(f"[DEBUG] Обновлен статус ордера {order_id} на {status}")
-                break
-
-        with open(file_path, "w") as file:
-            json.dump(orders, file, indent=4)
-        print(f"[DEBUG] Статус ордера {order_id} успешно обновлен в файле.")
+        with open("history.txt", "a", encoding="utf-8") as history_file:
+            history_file.write("".join(lines))
+        log.debug("В history.txt записано строк: %s", len(lines))
     except Exception as e:
-        print(f"[ERROR] Ошибка при обновлении статуса ордера: {e}")
+        print(f"[ERROR] Ошибка при записи в history.txt: {e}")
 
 # Функция для создания ордера на продажу
 def create_sell_order(pair, price, quantity, original_id=None):
     """Создает ордер на продажу с точным количеством и передает оригинальный ID, если он есть."""
-    print(f"[DEBUG] Пара: {pair}, Цена: {price}, Количество: {quantity}")
+    log.debug("Пара: %s, Цена: %s, Количество: %s", pair, price, quantity)
+
+    price, quantity, error = precision.prepare(pair, price, quantity)
+    if error:
+        print(f"[ERROR] Ордер на продажу {pair} не создан: {error}.")
+        return None
 
     order_data = {
         "symbol": pair,
         "side": "sell",
         "type": "limit",
-        "quantity": quantity,
-        "price": price
+        "quantity": wire(quantity),
+        "price": wire(price)
     }
 
     # Выполнение запроса на создание ордера
     response = AtaixAPI.post("/api/orders", order_data)
 
-    if isinstance(response, dict) and "result" in response:
-        sell_order = {
-            "orderID": response["result"]["orderID"],
-            "price": response["result"]["price"],
-            "quantity": response["result"]["quantity"],
-            "symbol": response["result"]["symbol"],
-            "created": response["result"]["created"],
-            "status": response["result"].get("status", "NEW"),
-            "side": "sell",
-            "cumCommission": response["result"].get('cumCommission', 0),  # Сохраняем комиссию
-        }
+    if isinstance(response, dict) and isinstance(response.get("result"), dict):
+        sell_order = Order.from_api(response["result"])
+        sell_order.side = "sell"
 
         # Если есть оригинальный ID, добавляем его
         if original_id:
-            sell_order["originalID"] = original_id
+            sell_order.original_id = original_id
 
         return sell_order
     else:
         print(f"[ERROR] Ошибка при создании ордера на продажу для ордера {original_id}: {response}")
         return None
 
-def update_commission_in_orders(order_id, commission, file_path=ORDERS_FILE):
-    """Обновляет комиссию для ордера в файле."""
-    try:
-        with open(file_path, "r") as file:
-            orders = json.load(file)
-
-        for order in orders:
-            if order["orderID"] == order_id:
-                order["cumCommission"] = commission  # Обновление комиссии
-                print(f"[DEBUG] Комиссия для ордера {order_id} обновлена на {commission}")
-                break
-
-        with open(file_path, "w") as file:
-            json.dump(orders, file, indent=4)
-        print(f"[DEBUG] Комиссия ордера {order_id} успешно обновлена в файле.")
-    except Exception as e:
-        print(f"[ERROR] Ошибка при обновлении комиссии ордера: {e}")
-
 
 
 
 # Функция для сканирования ордеров
 def scan_orders():
-    """Сканирует ордера, проверяет их статус и создает ордер на продажу при выполнении, удаляя обработанные покупки."""
-    try:
-        with open(ORDERS_FILE, "r") as file:
-            orders = json.load(file)
-
-        remaining_orders = []
-
-        for order in orders:
-            order_id = order["orderID"]
-            print(f"[INFO] Проверяем ордер с ID: {order_id}")
-
-            if order["status"] == "filled":
-                print(f"[INFO] Ордер {order_id} выполнен, создаем ордер на продажу.")
-
-                # Создаем ордер на продажу с увеличением цены
-                price = float(order["price"])
-                percent_increase = float(input(f"Введите на сколько процентов увеличить цену покупки {price} для ордера {order_id}: "))
-                sell_price = round(price * (1 + percent_increase / 100), 4)
-
-                sell_order = create_sell_order(order["symbol"], sell_price, order["quantity"], original_id=order.get("originalID"))
+    """Сканирует ордера, проверяет их статус и создает ордер на продажу при выполнении, удаляя обработанные покупки.
 
-                if sell_order:
-                    # Обновляем комиссию для ордера на продажу
-                    commission = order.get('cumCommission', 0)
-                    update_commission_in_orders(order["orderID"], commission)
-
-                    # Добавляем ордер на продажу в список оставшихся ордеров
-                    remaining_orders.append(sell_order)
-
-                    # Удаляем ордер покупки
-                    delete_purchase_order_and_log(order["orderID"], related_sell_order=sell_order)
-
-                    print(f"[INFO] Ордер на продажу {sell_order['orderID']} создан.")
-                else:
-                    print(f"[ERROR] Ошибка при создании ордера на продажу для ордера {order_id}")
-                    remaining_orders.append(order)
-            else:
-                remaining_orders.append(order)
-
-        with open(ORDERS_FILE, "w") as file:
-            json.dump(remaining_orders, file, indent=4)
+    Изменения хранилища и строки history.txt копятся за проход и записываются один раз.
+    """
+    history = []
+    scan = ScanMetrics("sell")
+    try:
+        with store.working_set(side="buy", status="filled") as orders:
+            scan.checked = len(orders)
+            for order in orders:
+                order_id = order.order_id
+                print(f"[INFO] Проверяем ордер с ID: {order_id}")
+
+                if order.status == "filled":
+                    print(f"[INFO] Ордер {order_id} выполнен, создаем ордер на продажу.")
+
+                    # Создаем ордер на продажу с увеличением цены
+                    price = order.price
+                    percent_increase = float(input(f"Введите на сколько процентов увеличить цену покупки {price} для ордера {order_id}: "))
+                    # Наценка округляется вверх до шага цены пары: продажа не дешевле заданного процента
+                    sell_price = precision.price(order.symbol, apply_pct(price, percent_increase), UP)
+
+                    sell_order = create_sell_order(order.symbol, sell_price, order.quantity, original_id=order.original_id)
+
+                    if sell_order:
+                        # Ордер на продажу заменяет покупку; в history - только запись о продаже
+                        orders.add(sell_order)
+                        orders.remove(order_id)
+                        history.append(format_sale_line(sell_order))
+                        scan.placed += 1
+
+                        print(f"[INFO] Ордер на продажу {sell_order.order_id} создан.")
+                    else:
+                        print(f"[ERROR] Ошибка при создании ордера на продажу для ордера {order_id}")
 
     except Exception as e:
         print(f"[ERROR] Ошибка при сканировании ордеров: {e}")
-
+    finally:
+        append_history(history)
+        scan.finish()
+
+
+
+# Пакетный режим: продажи по всем исполненным покупкам по правилу наценки
+def plan_sells(orders, rule):
+    """Цены продажи по правилу rule (MarkupRule): список (покупка, цена по шагу пары)."""
+    plan = []
+    for order in orders:
+        price, note = rule.sell_price(order)
+        if price is None:
+            print(f"[ПРОПУСК] Ордер {order.order_id}: {note}.")
+            continue
+        if note:
+            print(f"[INFO] Ордер {order.order_id}: {note}.")
+        # Вверх до шага цены: цена не ниже рассчитанной наценки
+        plan.append((order, precision.price(order.symbol, price, UP)))
+    return plan
+
+
+def run_batch(rule):
+    """Выставляет продажи по всем исполненным покупкам без вопросов.
+
+    Ордера выставляются параллельно (в пределах лимита частоты клиента),
+    хранилище и history.txt обновляются один раз в конце. Возвращает
+    созданные ордера на продажу.
+    """
+    history = []
+    scan = ScanMetrics("sell_batch")
+    try:
+        with store.working_set(side="buy", status="filled") as orders:
+            scan.checked = len(orders)
+            sales = place_sells(orders, history, rule)
+            scan.placed = len(sales)
+            return sales
+    finally:
+        append_history(history)
+        scan.finish()
+
+
+def place_sells(orders, history, rule):
+    """Продажи по покупкам рабочего набора orders; строки истории добавляются в history."""
+    plan = plan_sells(orders, rule)
+    if not plan:
+        print("[INFO] Нет исполненных покупок для продажи.")
+        return []
+
+    print(f"\n{'Пара':<12} {'Покупка':>14} {'Продажа':>14} {'Кол-во':>14}")
+    print("-" * 57)
+    for order, price in plan:
+        print(f"{order.symbol:<12} {order.fill_price:>14} {price:>14} {order.quantity:>14}")
+    print("-" * 57)
+
+    if rule.dry_run:
+        print(f"[DRY-RUN] Ордеров на продажу было бы выставлено: {len(plan)}.")
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(AtaixAPI.max_workers, len(plan))) as pool:
+        results = list(pool.map(
+            lambda item: create_sell_order(item[0].symbol, item[1], item[0].quantity, original_id=item[0].original_id),
+            plan,
+        ))
+
+    sales = [(order, sell_order) for (order, _), sell_order in zip(plan, results) if sell_order]
+    for order, sell_order in sales:
+        orders.add(sell_order)
+        orders.remove(order.order_id)
+        history.append(format_sale_line(sell_order))
+    for (order, price), sell_order in zip(plan, results):
+        if not sell_order:
+            print(f"[ERROR] Ошибка при создании ордера на продажу для ордера {order.order_id} по цене {price}")
+    print(f"[INFO] Выставлено ордеров на продажу: {len(sales)} из {len(plan)}.")
+    return [sell_order for _, sell_order in sales]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Продажа исполненных покупок: интерактивно или пакетом по правилу наценки")
+    parser.add_argument("--batch", action="store_true", help="выставить продажи по всем исполненным покупкам без вопросов")
+    parser.add_argument("--markup", type=float, help="наценка в %% (по умолчанию - из секции \"sell\" config.json)")
+    parser.add_argument("--dry-run", action="store_true", help="только показать цены продажи")
+    return parser.parse_args()
 
 
 # Точка входа
 if __name__ == "__main__":
+    args = parse_args()
+    if args.batch or args.dry_run:
+        # Пример секции: {"sell": {"markup_pct": 2, "markup": {"BTC/USDT": 1.5}, "fee_pct": 0.1, "min_profit_pct": 0.2}}
+        options = dict(read_config(CONFIG_FILE).get("sell", {}))
+        if args.markup is not None:
+            options["markup_pct"] = args.markup
+        run_batch(MarkupRule.from_config(options, args.dry_run))
+        AtaixAPI.print_stats()
+        sys.exit()
+
     while True:
         scan_orders()
         user_input = input('\nВведите "start" чтобы запустить снова или "exit" чтобы выйти: ').strip().lower()
@@ -257,3 +251,5 @@ if __name__ == "__main__":
             print('Выход из программы.')
             break
 
+    # Статистика задержек по эндпоинтам за сессию
+    AtaixAPI.print_stats()
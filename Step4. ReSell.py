@@ -1,100 +1,60 @@
 import json
-import requests
 import sys
 
+from ataix_client import Lazy, create_client
+from ataix_log import get_logger, setup_logging
+from metrics import ScanMetrics, observe_fill
+from order_model import Order, fmt_number, parse_time
+from order_poller import iter_order_statuses
+from order_store import OrderStore
+from precision import DOWN, PrecisionTable, apply_pct, wire
+from reconcile import CLOSED_STATUSES, fetch_snapshot
+
 # Константы
 CONFIG_FILE = "config.json"
-ORDERS_FILE = "orders_data.json"
 HISTORY_FILE = "history.txt"
-BASE_URL = "https://api.ataix.kz"
+
+log = get_logger("resell")
 
 # Загрузка API-ключа
 def load_config():
     try:
         with open(CONFIG_FILE, "r", encoding="utf-8") as f:
             config = json.load(f)
+            setup_logging(config)
             api_key = config.get("api_key")
             if not api_key:
                 print("Ошибка: API-ключ не найден в config.json")
                 sys.exit(1)
-            print("[DEBUG] API-ключ успешно загружен")
+            log.debug("API-ключ успешно загружен")
             return api_key
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Ошибка загрузки конфигурации: {e}")
         sys.exit(1)
 
-API_KEY = load_config()
+# Общий клиент API с пулом соединений и хранилище отслеживаемых ордеров.
+# Создаются при первом обращении: импорт модуля не читает config.json и не ходит в сеть
+AtaixAPI = Lazy(lambda: create_client(load_config()))
+store = Lazy(OrderStore)
 
-# Класс для работы с API
-class AtaixAPI:
-    headers = {
-        "accept": "application/json",
-        "X-API-Key": API_KEY
-    }
-
-    @staticmethod
-    def get(endpoint):
-        try:
-            print(f"[DEBUG] GET-запрос к {BASE_URL}{endpoint}")
-            response = requests.get(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса: {e}")
-            return None
-
-    @staticmethod
-    def delete(endpoint):
-        try:
-            print(f"[DEBUG] DELETE-запрос к {BASE_URL}{endpoint}")
-            response = requests.delete(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешное удаление ордера: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка удаления ордера: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса на удаление: {e}")
-            return None
-
-    @staticmethod
-    def post(endpoint, data):
-        try:
-            print(f"[DEBUG] POST-запрос к {BASE_URL}{endpoint} с данными: {data}")
-            response = requests.post(f"{BASE_URL}{endpoint}", headers=AtaixAPI.headers, json=data, timeout=20)
-            if response.status_code == 200:
-                print(f"[DEBUG] Успешный ответ от API: {response.json()}")
-                return response.json()
-            else:
-                print(f"[ERROR] Ошибка API: {response.status_code}, {response.text}")
-                return None
-        except requests.exceptions.RequestException as e:
-            print(f"[ERROR] Ошибка запроса на создание ордера: {e}")
-            return None
+# Шаги цены и количества пар из /api/symbols
+precision = Lazy(lambda: PrecisionTable(AtaixAPI))
 
 # Вспомогательные функции
-def write_to_history(order, action="Перезапуск Продажи: "):
+def format_history_line(order, action="Перезапуск Продажи: "):
+    # Используем averagePrice, если он есть, иначе обычную price
+    return (f"{action} OrderID {order.order_id}, "
+            f"цена {fmt_number(round(order.fill_price, 4))}, кол-во {fmt_number(order.quantity)}, символ {order.symbol}, "
+            f"время {order.created}, originalID {order.original_id}, комиссия {fmt_number(order.cum_commission)}\n")
+
+def append_history(lines):
+    """Дописывает строки в history.txt одной записью."""
+    if not lines:
+        return
     try:
-        # Используем averagePrice, если он есть, иначе обычную price
-        price_str = order.get('averagePrice') or order.get('price')
-        price = round(float(price_str), 4)
-
-        commission = order.get('cumCommission', '0')
-        order_id = order.get('orderID')
-
         with open(HISTORY_FILE, "a", encoding="utf-8") as file:
-            original_id = order.get('originalID', order['orderID'])
-            log_line = (f"{action} OrderID {order_id}, "
-                        f"цена {price}, кол-во {order['quantity']}, символ {order['symbol']}, "
-                        f"время {order['created']}, originalID {original_id}, комиссия {commission}\n")
-            file.write(log_line)
-
-        print(f"[DEBUG] Ордер {order_id} (originalID {original_id}) записан в history.txt с ценой {price}.")
+            file.write("".join(lines))
+        log.debug("В history.txt записано строк: %s", len(lines))
     except Exception as e:
         print(f"[ERROR] Ошибка при записи в history.txt: {e}")
 
@@ -108,141 +68,156 @@ def write_to_history(order, action="Перезапуск Продажи: "):
 
 
 
-def update_order_status(order_id, status):
-    try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
-
-        for order in orders:
-            if order["orderID"] == order_id:
-                order["status"] = status
-                print(f"[DEBUG] Обновлен статус ордера {order_id} на {status}")
-                break
-
-        with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-            json.dump(orders, file, indent=4, ensure_ascii=False)
-        print(f"[DEBUG] Статус ордера {order_id} успешно обновлен в файле.")
-    except Exception as e:
-        print(f"[ERROR] Ошибка при обновлении статуса ордера: {e}")
-
-def remove_order(order_id):
-    try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
-
-        orders = [order for order in orders if order["orderID"] != order_id]
-
-        with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-            json.dump(orders, file, indent=4, ensure_ascii=False)
-
-        print(f"[DEBUG] Ордер {order_id} удален из orders_data.json.")
-    except Exception as e:
-        print(f"[ERROR] Ошибка при удалении ордера: {e}")
-
 def create_orders(pair, price, quantity):
-    print(f"DEBUG: Создание ордера -> пара: {pair}, цена: {price} USDT, кол-во: {quantity}")
+    log.debug("Создание ордера -> пара: %s, цена: %s USDT, кол-во: %s", pair, price, quantity)
+
+    price, quantity, error = precision.prepare(pair, price, quantity)
+    if error:
+        print(f"Ошибка при создании ордера {pair}: {error}.")
+        return None
 
     order_data = {
         "symbol": pair,
         "side": "sell",  # Продажа
         "type": "limit",
-        "quantity": quantity,  # Используем количество токенов из старого ордера
-        "price": price
+        "quantity": wire(quantity),  # Используем количество токенов из старого ордера
+        "price": wire(price)
     }
 
     response = AtaixAPI.post("/api/orders", order_data)
 
-    if isinstance(response, dict) and "result" in response:
-        return {
-            "orderID": response["result"]["orderID"],
-            "price": response["result"]["price"],
-            "quantity": response["result"]["quantity"],
-            "symbol": response["result"]["symbol"],
-            "created": response["result"]["created"],
-            "status": response["result"].get("status", "NEW"),
-            "side": "sell",
-            "cumCommission": response["result"].get('cumCommission')
-        }
+    if isinstance(response, dict) and isinstance(response.get("result"), dict):
+        new_order = Order.from_api(response["result"])
+        new_order.side = "sell"
+        return new_order
     else:
         print("Ошибка при создании ордера.")
         return None
 
 # Основная функция для ордеров на продажу
-def scan_sell_orders():
+def scan_sell_orders(rule=None):
+    """Проверяет ордера на продажу и пересоздает неисполненные.
+
+    Без rule пересоздание подтверждается вводом "yes" и цена снижается на 1%;
+    с rule (RepriceRule) решения принимаются автоматически. Изменения
+    хранилища и строки history.txt копятся за проход и записываются один раз.
+    """
+    history = []
+    scan = ScanMetrics("resell")
     try:
-        with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-            orders = json.load(file)
-
-        for order in orders:
-            order_id = order["orderID"]
-            side = order.get("side", "buy")
-            print(f"[INFO] Проверяем ордер с ID: {order_id}, side: {side}")
-
-            if side.lower() != "sell":
-                continue  # Пропускаем ордера не на продажу
-
-            if order.get("is_recreated", False):
-                continue  # Пропускаем ордера, которые уже были пересозданы
-
-            order_status_response = AtaixAPI.get(f"/api/orders/{order_id}")
-            if order_status_response:
-                status_from_api = order_status_response.get("result", {}).get("status")
-                if status_from_api:
-                    if status_from_api == "filled":
-                        print(f"[INFO] Ордер {order_id} выполнен (filled). Обновляем статус.")
-                        update_order_status(order_id, "filled")
-
+        with store.working_set(side="sell") as orders:
+            scan_working_set(orders, history, scan, rule)
+    except Exception as e:
+        print(f"[ERROR] Ошибка при сканировании ордеров на продажу: {e}")
+    finally:
+        append_history(history)
+        scan.finish()
+
+
+def scan_working_set(orders, history, scan, rule=None):
+    """Один проход по ордерам на продажу рабочего набора orders.
+
+    Строки истории добавляются в history, счетчики прохода - в scan (ScanMetrics).
+    """
+    orders_to_check = {}
+
+    for order in orders:
+        order_id = order.order_id
+        side = order.side
+        print(f"[INFO] Проверяем ордер с ID: {order_id}, side: {side}")
+
+        if side != "sell":
+            continue  # Пропускаем ордера не на продажу
+
+        if order.is_recreated:
+            continue  # Пропускаем ордера, которые уже были пересозданы
+
+        orders_to_check[order_id] = order
+
+    scan.checked = len(orders_to_check)
+    # Статусы берутся из постраничного списка ордеров биржи; ордера, которых
+    # в нем нет, запрашиваются параллельно и обрабатываются по мере получения
+    snapshot = fetch_snapshot(AtaixAPI, orders_to_check.values()) if orders_to_check else None
+    for order_id, order_status_response in iter_order_statuses(AtaixAPI, orders_to_check, snapshot=snapshot):
+        order = orders_to_check[order_id]
+        if order_status_response:
+            status_from_api = order_status_response.get("result", {}).get("status")
+            if status_from_api:
+                if status_from_api == "filled":
+                    print(f"[INFO] Ордер {order_id} выполнен (filled). Убираем из хранилища.")
+                    order.update(order_status_response["result"])
+                    scan.filled += 1
+                    observe_fill("sell", parse_time(order.created), parse_time(order_status_response["result"].get("updated")))
+
+                    history.append(format_history_line(order, action="\nПродажа: "))
+                    orders.remove(order_id)
+                elif status_from_api == "new" or status_from_api.lower() in CLOSED_STATUSES:
+                    # Продажа, закрытая на бирже без нашей отмены (или после сбоя между
+                    # отменой и новым ордером), выставляется заново на непроданный остаток
+                    closed = status_from_api != "new"
+                    quantity = order.quantity
+                    if closed:
                         order.update(order_status_response["result"])
-
-                        write_to_history(order, action="\nПродажа: ")
-                        remove_order(order_id)
-                    elif status_from_api == "new":
+                        quantity = order.quantity - order.cum_quantity
+                        print(f"[INFO] Ордер {order_id} закрыт на бирже ({status_from_api}), продано "
+                              f"{fmt_number(order.cum_quantity)} из {fmt_number(order.quantity)}. "
+                              f"Готовим выставление остатка {fmt_number(quantity)}.")
+                        if quantity <= 0:
+                            continue
+                    else:
                         print(f"[INFO] Ордер {order_id} не выполнен (new). Готовим к отмене и пересозданию.")
 
-                        user_input = input(f"\n[ВНИМАНИЕ] Ордер с ID {order_id} (символ: {order['symbol']}, цена: {order['price']} USDT) не выполнен. Введите 'yes' для отмены и пересоздания: ").strip().lower()
-                        if user_input == "yes":
-                            delete_response = AtaixAPI.delete(f"/api/orders/{order_id}")
-                            if delete_response:
+                    new_price = None
+                    if rule is None:
+                        user_input = input(f"\n[ВНИМАНИЕ] Ордер с ID {order_id} (символ: {order.symbol}, цена: {order.price} USDT) не выполнен. Введите 'yes' для отмены и пересоздания: ").strip().lower()
+                        confirmed = user_input == "yes"
+                    else:
+                        new_price, reason = rule.next_price(order)
+                        confirmed = new_price is not None and not rule.dry_run
+                        if new_price is None:
+                            print(f"[ПРОПУСК] Ордер {order_id}: {reason}.")
+                        elif rule.dry_run:
+                            print(f"[DRY-RUN] Ордер {order_id} был бы пересоздан по цене {new_price}.")
+                    if confirmed:
+                        # Закрытый на бирже ордер отменять уже не нужно
+                        delete_response = closed or AtaixAPI.delete(f"/api/orders/{order_id}")
+                        if delete_response:
+                            # Создаем новый ордер
+                            if new_price is None:
+                                # Цена на 1% ниже, вниз до шага цены пары
+                                new_price = precision.price(order.symbol, apply_pct(order.price, -1), DOWN)
+                            new_order = create_orders(order.symbol, new_price, quantity)
+
+                            if new_order:
                                 # Сохраняем в history только старый ордер
-                                write_to_history(order, action="Перезапуск Продажи: ")
-
-                                # Удаляем старый ордер
-                                remove_order(order_id)
-
-                                # Создаем новый ордер
-                                price = float(order["price"])
-                                quantity = float(order["quantity"])
-                                new_price = round(price * 0.99, 4)
-                                new_order = create_orders(order["symbol"], new_price, quantity)
-
-                                if new_order:
-                                    new_order["originalID"] = order.get("originalID", order["orderID"])
+                                history.append(format_history_line(order, action="Перезапуск Продажи: "))
 
-                                    with open(ORDERS_FILE, "r", encoding="utf-8") as file:
-                                        updated_orders = json.load(file)
+                                # Старый ордер удаляем только после создания нового: иначе
+                                # монеты выпадут из хранилища, а следующий проход выставит
+                                # их заново по закрытому на бирже старому ордеру
+                                orders.remove(order_id)
 
-                                    updated_orders.append(new_order)
+                                new_order.original_id = order.original_id
+                                new_order.reprice_count = order.reprice_count + 1
 
-                                    with open(ORDERS_FILE, "w", encoding="utf-8") as file:
-                                        json.dump(updated_orders, file, indent=4, ensure_ascii=False)
+                                orders.add(new_order)
+                                scan.repriced += 1
 
-                                    print(f"[INFO] Новый ордер с ID {new_order['orderID']} успешно добавлен.")
+                                print(f"[INFO] Новый ордер с ID {new_order.order_id} успешно добавлен.")
 
-                                    # НЕ нужно снова писать новый ордер в history!
-                                    # Только старый ордер должен попасть в лог
-                                    order["is_recreated"] = True
-                            else:
-                                print(f"[ERROR] Не удалось удалить ордер {order_id}. Пересоздание отменено.")
+                                # НЕ нужно снова писать новый ордер в history!
+                                # Только старый ордер должен попасть в лог
+                                order.is_recreated = True
                         else:
-                            print(f"[ОТМЕНА] Отмена и пересоздание ордера {order_id} не подтверждены. Переход к следующему ордеру.")
-                    else:
-                        print(f"[INFO] Ордер {order_id} в статусе {status_from_api}. Статус не изменяем.")
+                            print(f"[ERROR] Не удалось удалить ордер {order_id}. Пересоздание отменено.")
+                    elif rule is None:
+                        print(f"[ОТМЕНА] Отмена и пересоздание ордера {order_id} не подтверждены. Переход к следующему ордеру.")
                 else:
-                    print(f"[ERROR] Статус ордера {order_id} не получен.")
+                    print(f"[INFO] Ордер {order_id} в статусе {status_from_api}. Статус не изменяем.")
             else:
-                print(f"[ERROR] Ошибка при получении статуса ордера {order_id}.")
-    except Exception as e:
-        print(f"[ERROR] Ошибка при сканировании ордеров на продажу: {e}")
+                print(f"[ERROR] Статус ордера {order_id} не получен.")
+        else:
+            print(f"[ERROR] Ошибка при получении статуса ордера {order_id}.")
 
 
 
@@ -263,3 +238,5 @@ if __name__ == "__main__":
             print('Выход из программы.')
             break
 
+    # Статистика задержек по эндпоинтам за сессию
+    AtaixAPI.print_stats()
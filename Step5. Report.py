@@ -1,15 +1,40 @@
+import argparse
+import json
+import os
 import re
 from datetime import datetime
+from itertools import islice
+
+from order_model import fmt_number
+from pnl import event_side, BUY, SELL
+from report_store import REPORT_DB, ReportStore
+
+# Константы
+HISTORY_FILE = "history.txt"
+CHECKPOINT_FILE = REPORT_DB
+REPORT_FILE = "report.html"
+CHUNK_EVENTS = 50000    # событий в одной пачке: векторный расчет итогов и одна транзакция
+
+# Регулярное выражение для извлечения данных из строки history.txt; числа только в
+# десятичной записи - строка с экспонентой (1e-05) не совпадает целиком и отбрасывается
+ORDER_LINE_PATTERN = re.compile(
+    r"([А-ЯЁа-яёA-Za-z\s\-]+):\s*OrderID\s+(\S+),\s*цена\s+([\d\.,]+),\s*кол-во\s+([\d\.,]+),"
+    r"\s*символ\s+(\S+),\s*время\s+([0-9T\-\:\.Z]+),\s*originalID\s+(\S+),\s*комиссия\s+([\d\.,]+)(?![\d\.,eE])"
+)
+
+# Разбор времени ордера
+def parse_time(value):
+    """Быстрый разбор ISO-8601 ("2024-01-01T10:00:00.123Z") с запасным strptime."""
+    try:
+        return datetime.fromisoformat(value[:-1] if value.endswith("Z") else value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
 
 # Функция для парсинга строки с данными
 def parse_order_line(line):
     """Парсим строку из history.txt для извлечения данных."""
-    # Обновленное регулярное выражение для извлечения данных из строки
-    pattern = r"([А-ЯЁа-яёA-Za-z\s\-]+):\s*OrderID\s+(\S+),\s*цена\s+([\d\.,]+),\s*кол-во\s+([\d\.,]+),\s*символ\s+(\S+),\s*время\s+([0-9T\-\:\.Z]+),\s*originalID\s+(\S+),\s*комиссия\s+([\d\.,]+)"
+    match = ORDER_LINE_PATTERN.search(line)
 
-
-    match = re.search(pattern, line)
-    
     if match:
         commission_str = match.group(8).replace(',', '.')  # Заменяем запятую на точку
         order_data = {
@@ -18,43 +43,69 @@ def parse_order_line(line):
             "цена": float(match.group(3)),
             "кол-во": float(match.group(4)),
             "символ": match.group(5),
-            "время": datetime.strptime(match.group(6), "%Y-%m-%dT%H:%M:%S.%fZ"),
+            "время": parse_time(match.group(6)),
             "originalID": match.group(7),
             "комиссия": float(commission_str)  # Теперь можно безопасно конвертировать
         }
         return order_data
     return None
 
+# Потоковое чтение истории
+def iter_history(file_path, offset=0):
+    """Построчно читает history.txt начиная с байтового смещения offset.
+
+    Возвращает пары (данные ордера или None, смещение после строки).
+    Незавершенная последняя строка не читается - она будет разобрана в следующий раз.
+    """
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        for raw_line in file:
+            if not raw_line.endswith(b"\n"):
+                break
+            offset += len(raw_line)
+            yield parse_order_line(raw_line.decode('utf-8', errors='replace').strip()), offset
+
 # Обработка данных из файла
-def process_history_file(file_path):
-    """Обрабатываем файл history.txt и генерируем отчет в HTML формате."""
-    with open(file_path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-
-    # Парсим данные из строк
-    orders = []
-    for line in lines:
-        order_data = parse_order_line(line.strip())
-        if order_data:
-            orders.append(order_data)
-    
-    # Группируем данные по originalID
-    grouped_data = {}
-    for order in orders:
-        originalID = order["originalID"]
-        if originalID not in grouped_data:
-            grouped_data[originalID] = []
-        grouped_data[originalID].append(order)
+def process_history_file(file_path, checkpoint_file=CHECKPOINT_FILE, full=False,
+                         output=REPORT_FILE, page_size=0, report_format="html"):
+    """Обрабатываем файл history.txt и генерируем отчет в HTML формате.
 
-    # Генерируем HTML отчет
-    generate_html_report(grouped_data)
+    Разбираются только строки, добавленные после прошлого отчета: они
+    дописываются в контрольную точку пачками, вместе с итогами по originalID.
+    """
+    store = ReportStore(checkpoint_file)
+    try:
+        if full:
+            store.reset(file_path)
+            offset = 0
+        else:
+            offset = store.position(file_path)
 
-# Генерация HTML отчета
-def generate_html_report(grouped_data):
-    """Генерирует HTML отчет для каждого блока данных по originalID."""
-    html_content = """
+        # Парсим новые строки и сохраняем их пачками
+        new_lines, chunk = 0, []
+        for order_data, offset in iter_history(file_path, offset):
+            new_lines += 1
+            if order_data:
+                chunk.append(order_data)
+                if len(chunk) >= CHUNK_EVENTS:
+                    store.add(chunk, offset)
+                    chunk = []
+        store.add(chunk, offset)
+        print(f"[INFO] Разобрано новых строк истории: {new_lines}")
+
+        # Генерируем отчет
+        if report_format == "json":
+            generate_json_report(store, output, page_size or 500)
+        else:
+            generate_html_report(store, output, page_size)
+    finally:
+        store.close()
+
+# Оформление отчета
+REPORT_HEAD = """
     <html>
     <head>
+        <meta charset="utf-8">
         <title>Отчет по Ордерам</title>
         <style>
             body {
@@ -99,82 +150,286 @@ def generate_html_report(grouped_data):
     <h1>Отчет по Ордеру</h1>
     """
 
-    for originalID, orders in grouped_data.items():
-        html_content += f'<div class="report-section"><h2>OriginalID: {originalID}</h2>'
-        
-        orders_sorted = sorted(orders, key=lambda x: x['время'])
-        
-        html_content += '<table><thead><tr><th>Тип события</th><th>OrderID</th><th>Цена</th><th>Кол-во</th><th>Символ</th><th>Время</th><th>Комиссия</th></tr></thead><tbody>'
-        
-        for order in orders_sorted:
-            html_content += f"""
+REPORT_FOOT = """
+    </body>
+    </html>
+    """
+
+ORDERS_TABLE_HEAD = '<table><thead><tr><th>Тип события</th><th>OrderID</th><th>Цена</th><th>Кол-во</th><th>Символ</th><th>Время</th><th>Комиссия</th></tr></thead><tbody>'
+
+# Таблица сводки по символам или дням
+def rollup_table(title, key_title, rows):
+    """Возвращает HTML-таблицу сводки по закрытым циклам."""
+    parts = [
+        f'<div class="report-section"><h2>{title}</h2>',
+        f'<table><thead><tr><th>{key_title}</th><th>Циклов</th><th>Доход/Убыток</th>'
+        '<th>Комиссии</th><th>Оборот</th><th>Процент</th></tr></thead><tbody>',
+    ]
+    for row in rows:
+        parts.append(f"<tr><td>{row['key']}</td><td>{row['cycles']}</td><td>{row['profit']:.5f}</td>"
+                     f"<td>{row['fees']:.5f}</td><td>{row['turnover']:.5f}</td><td>{row['percent']:.2f}%</td></tr>")
+    parts.append('</tbody></table></div>')
+    return "".join(parts)
+
+# Блок отчета по одному originalID
+def render_section(originalID, orders, totals):
+    """Возвращает HTML блока с событиями (уже по времени) и итогом по одному originalID."""
+    parts = [f'<div class="report-section"><h2>OriginalID: {originalID}</h2>', ORDERS_TABLE_HEAD]
+
+    for order in orders:
+        parts.append(f"""
                 <tr>
                     <td class="event-type">{order['событие']}</td>
                     <td>{order['OrderID']}</td>
-                    <td>{order['цена']}</td>
-                    <td>{order['кол-во']}</td>
+                    <td>{fmt_number(order['цена'])}</td>
+                    <td>{fmt_number(order['кол-во'])}</td>
                     <td>{order['символ']}</td>
                     <td>{order['время']}</td>
-                    <td>{order['комиссия']}</td>
+                    <td>{fmt_number(order['комиссия'])}</td>
                 </tr>
-            """
-        
-        html_content += '</tbody></table>'
+            """)
 
-        buy_orders = [o for o in orders if 'покупка' in o["событие"].lower()]
-        sell_orders = [o for o in orders if 'продажа' in o["событие"].lower()]
+    parts.append('</tbody></table>')
 
-        if len(buy_orders) != len(sell_orders):
-            html_content += '<p class="profit-loss">Ошибка: количество покупок и продаж не совпадает.</p>'
-        else:
-            total_income = 0
-            total_spent = 0
-            
-            for buy, sell in zip(buy_orders, sell_orders):
-                html_content += f"<p>Покупка: Цена={buy['цена']}, Кол-во={buy['кол-во']}, Комиссия={buy['комиссия']}</p>"
-                html_content += f"<p>Продажа: Цена={sell['цена']}, Кол-во={sell['кол-во']}, Комиссия={sell['комиссия']}</p>"
-                
-                total_spent += buy['цена'] * buy['кол-во'] + buy['комиссия']
-                total_income += sell['цена'] * sell['кол-во'] - sell['комиссия']
-
-            profit_loss = total_income - total_spent
-            profit_loss_rounded = round(profit_loss, 5)
-
-            # Вычисляем процент прибыли относительно total_spent
-            if total_spent != 0:
-                profit_percent = (profit_loss / total_spent) * 100
-            else:
-                profit_percent = 0
-
-            profit_percent_rounded = round(profit_percent, 2)
-
-            # Выводим результат дохода/убытка
-            profit_color = "blue" if profit_loss_rounded >= 0 else "red"
-            html_content += f'<p class="profit-loss">Доход/Убыток: <span style="color: {profit_color};">{profit_loss_rounded:.5f} USD</span></p>'
-
-            # Выводим процент дохода/убытка
-            profit_percent = (profit_loss / total_spent) * 100 if total_spent != 0 else 0
-            profit_percent_rounded = round(profit_percent, 2)
-            percent_color = "blue" if profit_percent_rounded >= 0 else "red"
-            html_content += (
-                '<p class="profit-percentage" style="color: black;">'
-                'Процент дохода/убытка: '
-                f'<span style="color: {percent_color};">{profit_percent_rounded:.2f}%</span>'
-                '</p>'
-            )
-
-        
-        html_content += '</div>'
-
-    html_content += """
-    </body>
-    </html>
+    if not totals["balanced"]:
+        parts.append('<p class="profit-loss">Ошибка: количество покупок и продаж не совпадает.</p>')
+    else:
+        buy_orders = [o for o in orders if event_side(o["событие"]) == BUY]
+        sell_orders = [o for o in orders if event_side(o["событие"]) == SELL]
+
+        for buy, sell in zip(buy_orders, sell_orders):
+            parts.append(f"<p>Покупка: Цена={fmt_number(buy['цена'])}, Кол-во={fmt_number(buy['кол-во'])}, "
+                         f"Комиссия={fmt_number(buy['комиссия'])}</p>")
+            parts.append(f"<p>Продажа: Цена={fmt_number(sell['цена'])}, Кол-во={fmt_number(sell['кол-во'])}, "
+                         f"Комиссия={fmt_number(sell['комиссия'])}</p>")
+
+        # Выводим результат дохода/убытка
+        profit_loss_rounded = round(totals["profit"], 5)
+        profit_color = "blue" if profit_loss_rounded >= 0 else "red"
+        parts.append(f'<p class="profit-loss">Доход/Убыток: <span style="color: {profit_color};">{profit_loss_rounded:.5f} USD</span></p>')
+
+        # Выводим процент дохода/убытка
+        profit_percent_rounded = round(totals["percent"], 2)
+        percent_color = "blue" if profit_percent_rounded >= 0 else "red"
+        parts.append(
+            '<p class="profit-percentage" style="color: black;">'
+            'Процент дохода/убытка: '
+            f'<span style="color: {percent_color};">{profit_percent_rounded:.2f}%</span>'
+            '</p>'
+        )
+
+    parts.append('</div>')
+    return "".join(parts)
+
+# Разбиение отчета на страницы
+def page_file_name(output, page):
+    """Имя файла страницы: первая страница - сам output, далее report_2.html и т.д."""
+    if page == 1:
+        return output
+    base, ext = os.path.splitext(output)
+    return f"{base}_{page}{ext}"
+
+def remove_stale_pages(output, pages):
+    """Удаляет страницы, оставшиеся от прошлого, более длинного отчета."""
+    page = pages + 1
+    while os.path.exists(page_file_name(output, page)):
+        os.remove(page_file_name(output, page))
+        page += 1
+
+def page_navigation(output, page, pages):
+    links = []
+    if page > 1:
+        links.append(f'<a href="{os.path.basename(page_file_name(output, page - 1))}">&larr; Назад</a>')
+    links.append(f'Страница {page} из {pages}')
+    if page < pages:
+        links.append(f'<a href="{os.path.basename(page_file_name(output, page + 1))}">Вперед &rarr;</a>')
+    return f'<p class="page-nav">{" | ".join(links)}</p>'
+
+# Генерация HTML отчета
+def generate_html_report(store, output=REPORT_FILE, page_size=0):
+    """Генерирует HTML отчет для каждого блока данных по originalID из контрольной точки store.
+
+    Блоки читаются из store по одному и сразу пишутся в файл, поэтому
+    память не растет с длиной истории; при page_size > 0 отчет
+    разбивается на страницы по page_size блоков.
     """
-    
-    with open('report.html', 'w', encoding='utf-8') as report_file:
-        report_file.write(html_content)
+    count = store.count()
+    page_size = page_size if page_size > 0 else max(1, count)
+    pages = max(1, -(-count // page_size))
+    sections = store.sections()
+
+    for page in range(1, pages + 1):
+        with open(page_file_name(output, page), 'w', encoding='utf-8') as report_file:
+            report_file.write(REPORT_HEAD)
+            if pages > 1:
+                report_file.write(page_navigation(output, page, pages))
+
+            for originalID, orders, totals in islice(sections, page_size):
+                report_file.write(render_section(originalID, orders, totals))
+
+            # Сводки по закрытым циклам - на последней странице
+            if page == pages:
+                report_file.write(rollup_table("Итоги по символам", "Символ", store.rollup("symbol")))
+                report_file.write(rollup_table("Итоги по дням", "День", store.rollup("day")))
+
+            if pages > 1:
+                report_file.write(page_navigation(output, page, pages))
+            report_file.write(REPORT_FOOT)
+
+    remove_stale_pages(output, pages)
+    print(f"[INFO] Отчет сохранен в {output} (страниц: {pages})")
+
+# Просмотрщик отчета в формате JSON
+REPORT_VIEWER = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Отчет по Ордерам</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 20px; }
+.report-section { margin-bottom: 40px; }
+.report-section h2 { color: #4CAF50; }
+table { width: 100%; border-collapse: collapse; margin-top: 10px; }
+table, th, td { border: 1px solid #ddd; }
+th, td { padding: 10px; text-align: left; }
+th { background-color: #f2f2f2; }
+.event-type, .profit-loss { font-weight: bold; }
+.event-type { color: #FF5733; }
+</style>
+</head>
+<body>
+<h1>Отчет по Ордеру</h1>
+<p><button id="prev">&larr; Назад</button> <span id="page"></span> <button id="next">Вперед &rarr;</button></p>
+<div id="sections"></div>
+<div id="summary"></div>
+<script>
+var DATA_DIR = __DATA_DIR__, PAGES = __PAGES__, SUMMARY = __SUMMARY__;
+var loaded = {}, current = 1;
+
+function el(tag, text, cls) {
+  var node = document.createElement(tag);
+  if (text !== undefined) node.textContent = text;
+  if (cls) node.className = cls;
+  return node;
+}
+
+function table(head, rows) {
+  var t = el("table"), tr = el("tr");
+  head.forEach(function (h) { tr.appendChild(el("th", h)); });
+  t.appendChild(tr);
+  rows.forEach(function (row) {
+    var r = el("tr");
+    row.forEach(function (v, i) { r.appendChild(el("td", String(v), i === 0 && head[0] === "Тип события" ? "event-type" : "")); });
+    t.appendChild(r);
+  });
+  return t;
+}
+
+function render() {
+  var box = document.getElementById("sections");
+  box.innerHTML = "";
+  document.getElementById("page").textContent = "Страница " + current + " из " + PAGES;
+  (loaded[current] || []).forEach(function (s) {
+    var div = el("div", undefined, "report-section");
+    div.appendChild(el("h2", "OriginalID: " + s.originalID));
+    div.appendChild(table(["Тип события", "OrderID", "Цена", "Кол-во", "Символ", "Время", "Комиссия"], s.rows));
+    if (!s.balanced) {
+      div.appendChild(el("p", "Ошибка: количество покупок и продаж не совпадает.", "profit-loss"));
+    } else {
+      var p = el("p", "Доход/Убыток: " + s.profit.toFixed(5) + " USD", "profit-loss");
+      p.style.color = s.profit >= 0 ? "blue" : "red";
+      div.appendChild(p);
+      var q = el("p", "Процент дохода/убытка: " + s.percent.toFixed(2) + "%", "profit-loss");
+      q.style.color = s.percent >= 0 ? "blue" : "red";
+      div.appendChild(q);
+    }
+    box.appendChild(div);
+  });
+}
+
+// Страницы подгружаются через <script>, чтобы отчет открывался и из файла (file://)
+function reportPage(page, sections) {
+  loaded[page] = sections;
+  if (page === current) render();
+}
+
+function show(page) {
+  current = Math.min(Math.max(1, page), PAGES);
+  if (loaded[current]) return render();
+  var script = document.createElement("script");
+  script.src = DATA_DIR + "/page_" + current + ".js";
+  document.body.appendChild(script);
+}
+
+document.getElementById("prev").onclick = function () { show(current - 1); };
+document.getElementById("next").onclick = function () { show(current + 1); };
+
+var summary = document.getElementById("summary");
+[["Итоги по символам", "Символ", SUMMARY.symbols], ["Итоги по дням", "День", SUMMARY.days]].forEach(function (item) {
+  summary.appendChild(el("h2", item[0]));
+  summary.appendChild(table([item[1], "Циклов", "Доход/Убыток", "Комиссии", "Оборот", "Процент"], item[2].map(function (r) {
+    return [r.key, r.cycles, r.profit.toFixed(5), r.fees.toFixed(5), r.turnover.toFixed(5), r.percent.toFixed(2) + "%"];
+  })));
+});
+show(1);
+</script>
+</body>
+</html>
+"""
+
+# Генерация отчета в формате JSON с просмотрщиком
+def generate_json_report(store, output=REPORT_FILE, page_size=500):
+    """Пишет компактные страницы данных и небольшой HTML-просмотрщик, который подгружает их по требованию."""
+    data_dir = f"{os.path.splitext(output)[0]}_data"
+    os.makedirs(data_dir, exist_ok=True)
+
+    page_size = max(1, page_size)
+    pages = max(1, -(-store.count() // page_size))
+    sections = store.sections()
+
+    for page in range(1, pages + 1):
+        with open(os.path.join(data_dir, f"page_{page}.js"), 'w', encoding='utf-8') as page_file:
+            page_file.write(f"reportPage({page},[")
+            for i, (originalID, orders, totals) in enumerate(islice(sections, page_size)):
+                section = {
+                    "originalID": originalID,
+                    "rows": [[o['событие'], o['OrderID'], o['цена'], o['кол-во'], o['символ'], o['время'], o['комиссия']]
+                             for o in orders],
+                    "balanced": totals["balanced"],
+                    "profit": round(totals["profit"], 5),
+                    "percent": round(totals["percent"], 2),
+                }
+                page_file.write(("," if i else "") + json.dumps(section, ensure_ascii=False, separators=(",", ":")))
+            page_file.write("]);\n")
+
+    # Удаляем страницы данных от прошлого, более длинного отчета
+    page = pages + 1
+    while os.path.exists(os.path.join(data_dir, f"page_{page}.js")):
+        os.remove(os.path.join(data_dir, f"page_{page}.js"))
+        page += 1
+
+    summary = {"symbols": store.rollup("symbol"), "days": store.rollup("day")}
+    viewer = (REPORT_VIEWER
+              .replace("__DATA_DIR__", json.dumps(os.path.basename(data_dir)))
+              .replace("__PAGES__", str(pages))
+              .replace("__SUMMARY__", json.dumps(summary, ensure_ascii=False)))
+    with open(output, 'w', encoding='utf-8') as report_file:
+        report_file.write(viewer)
+
+    print(f"[INFO] Отчет сохранен в {output}, данные в {data_dir} (страниц: {pages})")
 
 
 # Запуск программы
-file_path = 'history.txt'  # Укажите путь к вашему файлу history.txt
-process_history_file(file_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Отчет по ордерам из history.txt")
+    parser.add_argument("history", nargs="?", default=HISTORY_FILE, help="путь к файлу history.txt")
+    parser.add_argument("--full", action="store_true", help="пересчитать отчет с начала файла")
+    parser.add_argument("--output", default=REPORT_FILE, help="файл отчета")
+    parser.add_argument("--page-size", type=int, default=0,
+                        help="сколько originalID на страницу (0 - весь HTML-отчет одним файлом)")
+    parser.add_argument("--format", choices=["html", "json"], default="html",
+                        help="html - готовые страницы, json - данные и просмотрщик с подгрузкой страниц")
+    args = parser.parse_args()
+    process_history_file(args.history, full=args.full, output=args.output,
+                         page_size=args.page_size, report_format=args.format)
+
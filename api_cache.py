@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+
+from ataix_log import get_logger
+
+log = get_logger("cache")
+
+# Время жизни ответов по умолчанию (секунды). 0 - ответ всегда перепроверяется
+# на бирже, но при наличии ETag/Last-Modified запрос остается условным.
+DEFAULT_TTLS = {
+    "/api/symbols": 24 * 60 * 60,
+    "/api/currencies": 24 * 60 * 60,
+    "/api/prices": 0,
+}
+DEFAULT_CACHE_FILE = ".ataix_cache.json"
+
+
+class ResponseCache:
+    """Кэш ответов GET-запросов с TTL по эндпоинтам и хранением на диске.
+
+    scope - адрес API: записи, сохраненные для другой биржи (например,
+    локального mock_exchange.py), при загрузке отбрасываются.
+    """
+
+    def __init__(self, ttls=None, path=DEFAULT_CACHE_FILE, scope=None):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.path = path
+        self.scope = scope
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if isinstance(entries, dict):
+            self._entries = {
+                k: v for k, v in entries.items()
+                if k in self.ttls and isinstance(v, dict) and v.get("scope") == self.scope
+            }
+
+    def _persistent(self, endpoint):
+        """Сохраняется ли запись на диск: ответы с нулевым TTL живут только в памяти."""
+        return self.ttls.get(endpoint, 0) > 0
+
+    def _save(self):
+        """Атомарно сохраняет долгоживущие записи на диск."""
+        if not self.path:
+            return
+        entries = {k: v for k, v in self._entries.items() if self._persistent(k)}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error("Не удалось сохранить кэш %s: %s", self.path, e)
+
+    def cacheable(self, endpoint):
+        return endpoint in self.ttls
+
+    def lookup(self, endpoint):
+        """Возвращает (данные, свежие ли они) или (None, False), если записи нет."""
+        with self._lock:
+            entry = self._entries.get(endpoint)
+        if entry is None:
+            return None, False
+        fresh = time.time() - entry["stored"] < self.ttls.get(endpoint, 0)
+        return entry["data"], fresh
+
+    def conditional_headers(self, endpoint):
+        """Заголовки для условного запроса по сохраненным ETag/Last-Modified."""
+        with self._lock:
+            entry = self._entries.get(endpoint)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, endpoint, data, response_headers):
+        with self._lock:
+            self._entries[endpoint] = {
+                "data": data,
+                "stored": time.time(),
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "scope": self.scope,
+            }
+            if self._persistent(endpoint):
+                self._save()
+
+    def touch(self, endpoint):
+        """Продлевает запись после ответа 304 Not Modified."""
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry is None:
+                return None
+            entry["stored"] = time.time()
+            if self._persistent(endpoint):
+                self._save()
+            return entry["data"]
+
+
+def load_cache(config, scope=None):
+    """Создает кэш по необязательной секции "cache" из config.json."""
+    options = config.get("cache", {})
+    if options.get("enabled", True) is False:
+        return None
+    ttls = dict(DEFAULT_TTLS)
+    ttls.update({k: float(v) for k, v in options.get("ttl", {}).items()})
+    return ResponseCache(ttls, options.get("file", DEFAULT_CACHE_FILE), scope)
@@ -0,0 +1,443 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api_cache import load_cache
+from ataix_log import get_logger, Truncated
+from metrics import observe_request, setup_metrics
+from rate_limit import RateLimiter, backoff_delay, parse_retry_after
+
+# Константы
+CONFIG_FILE = "config.json"
+BASE_URL = "https://api.ataix.kz"
+# Переменная окружения для подмены адреса API (например, на mock_exchange.py)
+BASE_URL_ENV = "ATAIX_BASE_URL"
+
+log = get_logger("client")
+
+# Параметры пула соединений и таймаутов по умолчанию (секунды)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 20
+
+# Параллельные запросы и лимиты частоты (запросов в секунду, 0 - без лимита):
+# rate_limit - для чтения (GET), order_rate_limit - для создания/отмены ордеров
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_ORDER_RATE_LIMIT = 5
+
+# Повторы: 429 повторяется для любых запросов (биржа их не приняла),
+# ошибки сети и 5xx - только для идемпотентных GET
+DEFAULT_MAX_RETRIES = 4
+RETRY_STATUSES = {500, 502, 503, 504}
+
+# Кэш проверки прав API (/api/user/info) на диске
+PERMISSIONS_FILE = ".ataix_permissions.json"
+DEFAULT_PERMISSIONS_TTL = 24 * 60 * 60
+
+# Постраничный список ордеров аккаунта (новые первыми)
+ORDERS_LIST_ENDPOINT = "/api/user/orders"
+DEFAULT_ORDERS_PAGE_SIZE = 100
+
+# Сегменты пути с идентификаторами сводим к шаблону, чтобы счетчики
+# не разрастались на каждый orderID или валюту
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"^/api/orders/[^/]+"), "/api/orders/{id}"),
+    (re.compile(r"^/api/user/balances/[^/]+"), "/api/user/balances/{currency}"),
+]
+
+
+def endpoint_key(method, endpoint):
+    """Возвращает ключ для статистики: метод и путь без query и идентификаторов."""
+    path = endpoint.split("?", 1)[0]
+    for pattern, template in _ENDPOINT_PATTERNS:
+        if pattern.match(path):
+            path = pattern.sub(template, path)
+            break
+    return f"{method} {path}"
+
+
+def read_config(config_file=CONFIG_FILE):
+    """Читает config.json; при отсутствии файла возвращает пустой словарь."""
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def resolve_base_url(config):
+    """Адрес API: ATAIX_BASE_URL из окружения, затем "base_url" из config.json."""
+    return os.environ.get(BASE_URL_ENV) or config.get("base_url") or BASE_URL
+
+
+def load_http_options(config):
+    """Читает необязательную секцию "http" из config.json."""
+    http = config.get("http", {})
+    return {
+        "pool_size": int(http.get("pool_size", DEFAULT_POOL_SIZE)),
+        "connect_timeout": float(http.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+        "read_timeout": float(http.get("read_timeout", DEFAULT_READ_TIMEOUT)),
+        "max_workers": int(http.get("max_workers", DEFAULT_MAX_WORKERS)),
+        "rate_limit": float(http.get("rate_limit", DEFAULT_RATE_LIMIT)),
+        "order_rate_limit": float(http.get("order_rate_limit", DEFAULT_ORDER_RATE_LIMIT)),
+        "max_retries": int(http.get("max_retries", DEFAULT_MAX_RETRIES)),
+    }
+
+
+class EndpointStats:
+    """Счетчики задержек для одного эндпоинта."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def add(self, elapsed, ok):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.total += elapsed
+        self.min = elapsed if self.min is None else min(self.min, elapsed)
+        self.max = max(self.max, elapsed)
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class AtaixClient:
+    """HTTP-клиент ATAIX с постоянным пулом keep-alive соединений."""
+
+    def __init__(self, api_key=None, base_url=BASE_URL, pool_size=DEFAULT_POOL_SIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_workers=DEFAULT_MAX_WORKERS, rate_limit=DEFAULT_RATE_LIMIT,
+                 order_rate_limit=DEFAULT_ORDER_RATE_LIMIT, max_retries=DEFAULT_MAX_RETRIES, cache=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_workers = max(1, max_workers)
+        self.read_limiter = RateLimiter(rate_limit)
+        self.order_limiter = RateLimiter(order_rate_limit)
+        self.max_retries = max(0, max_retries)
+        self.cache = cache
+        # None - еще не проверяли, есть ли на бирже эндпоинт всех балансов сразу
+        self._bulk_balances = None
+        # То же для постраничного списка ордеров
+        self._bulk_orders = None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, self.max_workers), pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"accept": "application/json"})
+        if api_key:
+            self.session.headers["X-API-Key"] = api_key
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def request(self, method, endpoint, **kwargs):
+        """Выполняет запрос с учетом лимитов частоты и повторами.
+
+        Возвращает объект Response; если повторы исчерпаны, возвращается
+        последний ответ или пробрасывается исключение requests.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.read_limiter if method == "GET" else self.order_limiter
+        idempotent = method == "GET"
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self._send(limiter, method, endpoint, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not idempotent or last_attempt:
+                    raise
+                delay = backoff_delay(attempt)
+                log.warning("Ошибка сети для %s %s (%s), повтор через %.2f с", method, endpoint, e, delay)
+                time.sleep(delay)
+                continue
+
+            throttled = response.status_code == 429
+            if last_attempt or not (throttled or (idempotent and response.status_code in RETRY_STATUSES)):
+                return response
+
+            if throttled:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                delay = backoff_delay(attempt) if delay is None else delay
+            else:
+                delay = backoff_delay(attempt)
+            log.warning("Ответ %s для %s %s, повтор через %.2f с", response.status_code, method, endpoint, delay)
+
+            if throttled:
+                # Притормаживаем всех, кто использует этот лимит, а не только текущий поток
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    def _send(self, limiter, method, endpoint, **kwargs):
+        """Одна попытка запроса через общий пул с учетом задержки в статистике."""
+        key = endpoint_key(method, endpoint)
+        limiter.acquire()
+        start = time.perf_counter()
+        ok = False
+        status = "error"
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+            ok = response.status_code in (200, 304)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._stats.setdefault(key, EndpointStats()).add(elapsed, ok)
+            observe_request(key, status, elapsed)
+
+    def _call(self, method, endpoint, data=None):
+        """Выполняет запрос и возвращает JSON-ответ или None при ошибке."""
+        if method == "GET" and self.cache is not None and self.cache.cacheable(endpoint):
+            return self._cached_get(endpoint)
+        try:
+            if data is None:
+                log.debug("%s-запрос к %s%s", method, self.base_url, endpoint)
+                response = self.request(method, endpoint)
+            else:
+                log.debug("%s-запрос к %s%s с данными: %s", method, self.base_url, endpoint, Truncated(data))
+                response = self.request(method, endpoint, json=data)
+
+            if response.status_code == 200:
+                result = response.json()
+                log.debug("Успешный ответ от API: %s", Truncated(result))
+                return result
+            else:
+                log.error("Ошибка API: %s, %s", response.status_code, Truncated(response.text))
+                return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error("Ошибка запроса %s %s: %s", method, endpoint, e)
+            return None
+
+    def _cached_get(self, endpoint):
+        """GET через кэш: свежий ответ отдается без запроса, устаревший перепроверяется."""
+        cached, fresh = self.cache.lookup(endpoint)
+        if fresh:
+            log.debug("Ответ для %s взят из кэша", endpoint)
+            return cached
+
+        try:
+            log.debug("GET-запрос к %s%s", self.base_url, endpoint)
+            response = self.request("GET", endpoint, headers=self.cache.conditional_headers(endpoint))
+            if response.status_code == 304:
+                log.debug("Ответ для %s не изменился (304), используем кэш", endpoint)
+                return self.cache.touch(endpoint)
+            if response.status_code == 200:
+                result = response.json()
+                log.debug("Успешный ответ от API: %s", Truncated(result))
+                self.cache.store(endpoint, result, response.headers)
+                return result
+            log.error("Ошибка API: %s, %s", response.status_code, Truncated(response.text))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error("Ошибка запроса GET %s: %s", endpoint, e)
+
+        if cached is not None:
+            log.info("Используем устаревший ответ из кэша для %s", endpoint)
+        return cached
+
+    def get(self, endpoint):
+        """Выполняет GET-запрос к API."""
+        return self._call("GET", endpoint)
+
+    def post(self, endpoint, data):
+        """Выполняет POST-запрос к API."""
+        return self._call("POST", endpoint, data)
+
+    def delete(self, endpoint):
+        """Выполняет DELETE-запрос к API."""
+        return self._call("DELETE", endpoint)
+
+    def get_balances(self, currencies):
+        """Возвращает ответы API по балансам валют: {валюта: ответ}.
+
+        Сначала пробует получить все балансы одним запросом, иначе
+        опрашивает валюты параллельно в пределах max_workers и лимита частоты.
+        """
+        currencies = sorted(set(currencies))
+        if self._bulk_balances is not False:
+            balances = self._get_bulk_balances()
+            if balances is not None:
+                return {c: balances.get(c, {"status": True, "available": "0"}) for c in currencies}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(currencies) or 1)) as pool:
+            responses = pool.map(lambda c: self.get(f"/api/user/balances/{c}"), currencies)
+            return dict(zip(currencies, responses))
+
+    def _get_bulk_balances(self):
+        """Пытается получить все балансы одним запросом к /api/user/balances."""
+        try:
+            response = self.request("GET", "/api/user/balances")
+            data = response.json() if response.status_code == 200 else None
+        except (requests.exceptions.RequestException, ValueError):
+            data = None
+
+        result = data.get("result") if isinstance(data, dict) else None
+        if not isinstance(result, list):
+            self._bulk_balances = False
+            return None
+
+        self._bulk_balances = True
+        balances = {}
+        for item in result:
+            if isinstance(item, dict) and "currency" in item:
+                balances[item["currency"]] = {"status": True, **item}
+        return balances
+
+    def list_orders(self, since=None, page_size=DEFAULT_ORDERS_PAGE_SIZE, max_pages=None):
+        """Ордера аккаунта из постраничного списка: {orderID: ордер}.
+
+        Листание идет от новых ордеров к старым и останавливается на странице,
+        где встретились ордера старше since (строка created в ISO-8601), или
+        после max_pages страниц. Возвращает None, если список не поддерживается
+        биржей или страница не получена - тогда статусы нужно запрашивать по одному.
+        """
+        if self._bulk_orders is False:
+            return None
+
+        orders = {}
+        offset = 0
+        while True:
+            endpoint = f"{ORDERS_LIST_ENDPOINT}?limit={page_size}&offset={offset}"
+            try:
+                response = self.request("GET", endpoint)
+                data = response.json() if response.status_code == 200 else None
+            except (requests.exceptions.RequestException, ValueError):
+                response, data = None, None
+
+            result = data.get("result") if isinstance(data, dict) else None
+            if not isinstance(result, list):
+                if response is not None and response.status_code in (404, 405):
+                    self._bulk_orders = False
+                log.warning("Список ордеров не получен, статусы будут запрошены по одному")
+                return None
+
+            self._bulk_orders = True
+            for item in result:
+                if isinstance(item, dict) and "orderID" in item:
+                    orders[item["orderID"]] = item
+            if len(result) < page_size or (since and str(result[-1].get("created", "")) < since):
+                return orders
+            offset += page_size
+            if max_pages and offset >= max_pages * page_size:
+                return orders
+
+    def stats(self):
+        """Возвращает снимок счетчиков задержек по эндпоинтам."""
+        with self._stats_lock:
+            return {
+                key: {
+                    "count": s.count,
+                    "errors": s.errors,
+                    "avg_ms": round(s.avg * 1000, 1),
+                    "min_ms": round((s.min or 0.0) * 1000, 1),
+                    "max_ms": round(s.max * 1000, 1),
+                }
+                for key, s in self._stats.items()
+            }
+
+    def print_stats(self):
+        """Выводит таблицу задержек по эндпоинтам."""
+        stats = self.stats()
+        if not stats:
+            return
+        print(f"\n{'Эндпоинт':<40} {'Кол-во':>7} {'Ошибки':>7} {'Сред.мс':>9} {'Макс.мс':>9}")
+        print("-" * 76)
+        for key, s in sorted(stats.items()):
+            print(f"{key:<40} {s['count']:>7} {s['errors']:>7} {s['avg_ms']:>9} {s['max_ms']:>9}")
+
+    def close(self):
+        self.session.close()
+
+
+class Lazy:
+    """Объект, который создается функцией factory при первом обращении к его атрибутам.
+
+    Клиент и хранилище объявляются на уровне модуля шага, но config.json
+    читается, а база и соединения открываются только когда они нужны.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    @property
+    def created(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        if name in ("_factory", "_instance", "_lock"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def close(self):
+        """Закрывает объект, только если он уже был создан."""
+        if self._instance is not None:
+            self._instance.close()
+
+
+def check_permissions(client, ttl=DEFAULT_PERMISSIONS_TTL, path=PERMISSIONS_FILE, force=False):
+    """Ответ /api/user/info с кэшем на диске на ttl секунд; None при ошибке.
+
+    Запись привязана к адресу API и отпечатку ключа: при смене ключа или
+    биржи права проверяются заново.
+    """
+    fingerprint = hashlib.sha256(
+        f"{client.base_url}|{client.session.headers.get('X-API-Key', '')}".encode("utf-8")
+    ).hexdigest()
+
+    if not force:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if isinstance(entry, dict) and entry.get("key") == fingerprint \
+                and time.time() - entry.get("checked", 0) < ttl:
+            log.debug("Права API взяты из %s", path)
+            return entry.get("response")
+
+    response = client.get("/api/user/info")
+    if response and isinstance(response, dict):
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": fingerprint, "checked": time.time(), "response": response}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.error("Не удалось сохранить %s: %s", path, e)
+    return response
+
+
+def create_client(api_key=None, config_file=CONFIG_FILE):
+    """Создает клиент с адресом API и параметрами пула, таймаутов и кэша из config.json."""
+    config = read_config(config_file)
+    setup_metrics(config)
+    base_url = resolve_base_url(config)
+    if base_url != BASE_URL:
+        log.info("Используется адрес API %s", base_url)
+    return AtaixClient(api_key, base_url=base_url, cache=load_cache(config, base_url),
+                       **load_http_options(config))
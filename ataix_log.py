@@ -0,0 +1,78 @@
+import json
+import logging
+import sys
+
+# Константы
+LOGGER_NAME = "ataix"
+DEFAULT_LEVEL = "INFO"
+DEFAULT_MAX_PAYLOAD = 500
+
+_max_payload = DEFAULT_MAX_PAYLOAD
+
+
+class Truncated:
+    """Ленивое представление большого объекта для логов.
+
+    Строка формируется только если сообщение действительно выводится,
+    и обрезается до max_payload символов.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=None):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.value)
+        limit = self.limit if self.limit is not None else _max_payload
+        if limit and len(text) > limit:
+            return f"{text[:limit]}... (+{len(text) - limit} символов)"
+        return text
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Форматирует записи лога в JSON, по одной на строку."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(config=None):
+    """Настраивает логирование по необязательной секции "logging" из config.json.
+
+    Пример: {"logging": {"level": "DEBUG", "json_file": "ataix.log.jsonl", "max_payload": 500}}
+    """
+    global _max_payload
+    options = (config or {}).get("logging", {})
+    _max_payload = int(options.get("max_payload", DEFAULT_MAX_PAYLOAD))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(str(options.get("level", DEFAULT_LEVEL)).upper())
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    logger.addHandler(console)
+
+    if options.get("json_file"):
+        sink = logging.FileHandler(options["json_file"], encoding="utf-8")
+        sink.setFormatter(JsonLinesFormatter())
+        logger.addHandler(sink)
+    return logger
+
+
+def get_logger(name=None):
+    """Логгер пакета: get_logger("client") -> "ataix.client"."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+try:
+    import resource     # только Unix
+except ImportError:
+    resource = None
+
+from ataix_client import endpoint_key
+from daemon import load_step
+from repricing import MarkupRule
+
+# Прогон Buy -> ReBuy -> Sell -> ReSell -> Report против mock_exchange.py
+# на синтетических книгах ордеров. Результаты пишутся в JSON для сравнения между коммитами.
+
+# Константы
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_FILL_FRACTION = 0.5     # доля ордеров, исполняемых биржей перед ReBuy и ReSell
+DEFAULT_SELL_PERCENT = "2"      # наценка продажи в Step3, %
+DEFAULT_BALANCE = 10 ** 12      # баланс USDT биржи, чтобы хватило на любую книгу
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(sorted_values, p):
+    """Перцентиль по методу ближайшего ранга."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class LatencyRecorder:
+    """Собирает задержки всех HTTP-запросов клиента по эндпоинтам."""
+
+    def __init__(self, client):
+        self.samples = {}
+        self._request = client.session.request
+        client.session.request = self._timed
+
+    def _timed(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._request(method, url, *args, **kwargs)
+        finally:
+            key = endpoint_key(method, urlsplit(url).path)
+            self.samples.setdefault(key, []).append(time.perf_counter() - start)
+
+    def reset(self):
+        self.samples = {}
+
+    def summary(self):
+        result = {}
+        for key, values in sorted(self.samples.items()):
+            values = sorted(values)
+            result[key] = {
+                "count": len(values),
+                **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in (50, 95, 99)},
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        return result
+
+
+def answer(prompt=""):
+    """Подставляется вместо input() в шагах: подтверждает все действия."""
+    return DEFAULT_SELL_PERCENT if "процент" in prompt else "yes"
+
+
+def peak_rss_kb():
+    """Пиковый RSS процесса за все время работы (ru_maxrss: КБ в Linux, байты в macOS); None в Windows."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+class Bench:
+    """Один прогон конвейера на книге из size ордеров в отдельном каталоге."""
+
+    def __init__(self, size, base_url, trace=False):
+        self.size = size
+        self.base_url = base_url
+        self.trace = trace
+        self.phases = {}
+        self.steps = {}
+
+    def load_steps(self):
+        buy = load_step(os.path.join(REPO_DIR, "Step1. Buy.py"), "buy")
+        rebuy = load_step(os.path.join(REPO_DIR, "Step2. ReBuy.py"), "rebuy")
+        sell = load_step(os.path.join(REPO_DIR, "Step3. Sell.py"), "sell")
+        resell = load_step(os.path.join(REPO_DIR, "Step4. ReSell.py"), "resell")
+        report = load_step(os.path.join(REPO_DIR, "Step5. Report.py"), "report")
+
+        # Все шаги работают через один клиент и одно хранилище, как в daemon.py
+        for step in (rebuy, sell, resell):
+            step.AtaixAPI.close()
+            step.store.close()
+            step.AtaixAPI = buy.AtaixAPI
+            step.store = buy.store
+            step.precision = buy.precision
+        for step in (buy, rebuy, sell, resell):
+            step.input = answer
+
+        self.recorder = LatencyRecorder(buy.AtaixAPI)
+        self.steps = {"buy": buy, "rebuy": rebuy, "sell": sell, "resell": resell, "report": report}
+
+    def measure(self, name, func, *args):
+        """Выполняет фазу с замером времени, запросов, задержек и (с trace) пика памяти фазы."""
+        requests.delete(f"{self.base_url}/mock/stats")
+        self.recorder.reset()
+        if self.trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = func(*args)
+        wall = time.perf_counter() - start
+
+        phase = {"wall_s": round(wall, 3)}
+        if self.trace:
+            phase["tracemalloc_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+
+        server = requests.get(f"{self.base_url}/mock/stats").json()
+        phase["requests"] = sum(server["requests"].values())
+        phase["requests_by_endpoint"] = server["requests"]
+        phase["latency"] = self.recorder.summary()
+        phase["orders_after"] = server["statuses"]
+        self.phases[name] = phase
+        print(f"[INFO] {self.size:>6} {name:<13} {wall:8.2f} с {phase['requests']:>7} запросов")
+        return result
+
+    def place_book(self):
+        """Step1: выставляет size ордеров на покупку немного ниже рынка."""
+        buy = self.steps["buy"]
+        prices = buy.get_market_snapshot().low_price_pairs("USDT", float("inf"))
+        rng = random.Random(self.size)
+        symbols = sorted(prices)
+        for i in range(self.size):
+            symbol = symbols[i % len(symbols)]
+            pair = symbol.split("/")[0]
+            price = buy.calculate_order_price(prices[symbol], rng.uniform(0.5, 3), pair)
+            order = buy.create_orders(pair, price, 1 if price >= 1 else 100)
+            if order:
+                buy.save_order(order)
+
+    def fill(self):
+        requests.post(f"{self.base_url}/mock/fill", json={"fraction": DEFAULT_FILL_FRACTION})
+
+    def run(self):
+        self.load_steps()
+        steps = self.steps
+        self.measure("buy", self.place_book)
+        self.measure("get_balances", steps["buy"].get_balances)
+        self.fill()
+        self.measure("rebuy_scan", steps["rebuy"].scan_orders)
+        self.measure("sell_scan", steps["sell"].run_batch, MarkupRule(markup_pct=float(DEFAULT_SELL_PERCENT)))
+        self.fill()
+        self.measure("resell_scan", steps["resell"].scan_sell_orders)
+        self.measure("report", steps["report"].process_history_file, steps["report"].HISTORY_FILE,
+                     steps["report"].CHECKPOINT_FILE, True)
+        steps["buy"].AtaixAPI.close()
+        steps["buy"].store.close()
+        # ru_maxrss - максимум за весь процесс, а не за фазу, поэтому пишется один раз на прогон;
+        # память отдельных фаз - tracemalloc_peak_kb (--tracemalloc)
+        return {"size": self.size, "peak_rss_kb": peak_rss_kb(), "phases": self.phases}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_exchange(size, latency_ms, pairs):
+    """Запускает mock_exchange.py отдельным процессом, чтобы он не влиял на RSS и GIL замеряемого процесса."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "mock_exchange.py"), "--port", str(port), "--pairs", str(pairs),
+         "--balance", str(DEFAULT_BALANCE), "--seed", str(size), "--tick", "0", "--latency", str(latency_ms)],
+        stdout=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"{base_url}/mock/stats", timeout=1)
+            return process, base_url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Имитация биржи не запустилась")
+
+
+def run_size(size, latency_ms=0.0, pairs=50, trace=False):
+    """Прогон одного размера книги: свой каталог и своя биржа."""
+    process, base_url = start_exchange(size, latency_ms, pairs)
+    workdir = tempfile.mkdtemp(prefix=f"ataix_bench_{size}_")
+    os.chdir(workdir)
+    config = {
+        "api_key": "bench",
+        "base_url": base_url,
+        # Лимиты частоты клиента отключены: меряется сам код, а не пауза лимитера
+        "http": {"rate_limit": 0, "order_rate_limit": 0},
+        "logging": {"level": "WARNING"},
+    }
+    with open("config.json", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    try:
+        return Bench(size, base_url, trace=trace).run()
+    finally:
+        process.terminate()
+        process.wait()
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон шагов против mock_exchange.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="размеры книги ордеров")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON-файл с результатами")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответов биржи, мс")
+    parser.add_argument("--pairs", type=int, default=50, help="количество торговых пар")
+    parser.add_argument("--tracemalloc", action="store_true", help="замерять пик выделенной памяти каждой фазы (медленнее)")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        result = run_size(args.run_size, args.latency, args.pairs, args.tracemalloc)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        "revision": git_revision(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "latency_ms": args.latency,
+        "runs": [],
+    }
+    # Каждый размер - в отдельном процессе, чтобы пиковый RSS не накапливался
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            result_file = tmp.name
+        command = [sys.executable, os.path.abspath(__file__), "--run-size", str(size), "--result-file", result_file,
+                   "--latency", str(args.latency), "--pairs", str(args.pairs)]
+        if args.tracemalloc:
+            command.append("--tracemalloc")
+        subprocess.run(command, check=True)
+        with open(result_file, "r", encoding="utf-8") as f:
+            results["runs"].append(json.load(f))
+        os.remove(result_file)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"[INFO] Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import importlib.util
+import os
+import time
+
+from ataix_client import CONFIG_FILE, read_config
+from ataix_log import get_logger
+from reconcile import reconcile
+from repricing import BookMirror, BookRepricer, PricesSource, RepriceRule
+
+# Константы
+DEFAULT_INTERVAL = 60
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = get_logger("daemon")
+
+
+def load_step(file_name, module_name):
+    """Загружает скрипт шага ("Step2. ReBuy.py") как модуль; путь считается от каталога скриптов."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPTS_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_rule(side, options, dry_run, mirror, precision=None):
+    """Правило пересоздания: по стакану ("strategy": "book") или шагом в процентах."""
+    if options.get("strategy") == "book":
+        return BookRepricer.from_config(side, options, dry_run, mirror, precision)
+    return RepriceRule.from_config(side, options, dry_run, precision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Автоматическое пересоздание неисполненных ордеров (ReBuy + ReSell)")
+    parser.add_argument("--once", action="store_true", help="выполнить один проход и выйти")
+    parser.add_argument("--dry-run", action="store_true", help="только показать, какие ордера были бы пересозданы")
+    args = parser.parse_args()
+
+    # Пример секции: {"daemon": {"interval": 60, "dry_run": false,
+    #   "rebuy": {"step_pct": 1, "max_steps": 10, "min_interval": 300, "max_price": {"BTC/USDT": 70000}},
+    #   "resell": {"strategy": "book", "placement": "improve", "max_step_pct": 5, "min_price": {"BTC/USDT": 60000}}}}
+    options = read_config(CONFIG_FILE).get("daemon", {})
+    dry_run = args.dry_run or bool(options.get("dry_run", False))
+    interval = float(options.get("interval", DEFAULT_INTERVAL))
+
+    rebuy = load_step("Step2. ReBuy.py", "rebuy")
+    resell = load_step("Step4. ReSell.py", "resell")
+    # Оба шага работают через один клиент (общий лимит запросов), одно хранилище
+    # и одну таблицу шагов цены
+    resell.AtaixAPI.close()
+    resell.store.close()
+    resell.AtaixAPI = rebuy.AtaixAPI
+    resell.store = rebuy.store
+    resell.precision = rebuy.precision
+
+    # Котировки для правил "book" общие: один запрос /api/prices на проход
+    mirror = BookMirror(PricesSource(rebuy.AtaixAPI))
+    buy_rule = make_rule("buy", options.get("rebuy", {}), dry_run, mirror, rebuy.precision)
+    sell_rule = make_rule("sell", options.get("resell", {}), dry_run, mirror, rebuy.precision)
+
+    if dry_run:
+        print("[INFO] Режим dry-run: ордера не отменяются и не создаются.")
+
+    # Перед первым проходом сверяем хранилище с биржей
+    reconcile(rebuy.AtaixAPI, rebuy.store, dry_run=dry_run).show()
+
+    try:
+        while True:
+            started = time.monotonic()
+            rebuy.scan_orders(buy_rule)
+            resell.scan_sell_orders(sell_rule)
+            if args.once:
+                break
+            delay = max(0.0, interval - (time.monotonic() - started))
+            log.debug("Следующий проход через %.0f с", delay)
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        print("\n[INFO] Остановлено пользователем.")
+    finally:
+        rebuy.AtaixAPI.print_stats()
+        rebuy.AtaixAPI.close()
+        rebuy.store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import os
+import re
+
+# Константы
+HISTORY_FILE = "history.txt"
+
+# Строка истории вида "ПОКУПКА:  OrderID 123, цена ..."
+_EVENT_PATTERN = re.compile(r"^\s*([^:\n]+?):\s+OrderID\s+([^,\s]+)")
+
+
+def event_name(action):
+    """Приводит подпись события ("\\nПОКУПКА: ") к ключу ("ПОКУПКА")."""
+    return action.strip().rstrip(":").strip()
+
+
+class HistoryIndex:
+    """Индекс уже записанных в history.txt событий (событие, OrderID).
+
+    Ключи хранятся в отдельном файле рядом с историей и загружаются в
+    множество, поэтому проверка на дубликат не читает history.txt.
+    """
+
+    def __init__(self, history_file=HISTORY_FILE, keys_file=None):
+        self.history_file = history_file
+        self.keys_file = keys_file or f"{history_file}.keys"
+        self._keys = set()
+
+        if not os.path.exists(history_file):
+            # Истории нет - старые ключи недействительны
+            if os.path.exists(self.keys_file):
+                os.remove(self.keys_file)
+        elif os.path.exists(self.keys_file):
+            self._load()
+        else:
+            self._rebuild()
+
+    def _load(self):
+        with open(self.keys_file, "r", encoding="utf-8") as f:
+            for line in f:
+                event, _, order_id = line.rstrip("\n").partition("\t")
+                if order_id:
+                    self._keys.add((event, order_id))
+
+    def _rebuild(self):
+        """Однократно строит индекс по существующему history.txt."""
+        with open(self.history_file, "r", encoding="utf-8") as f:
+            for line in f:
+                match = _EVENT_PATTERN.match(line)
+                if match:
+                    self._keys.add((match.group(1).strip(), match.group(2)))
+
+        with open(self.keys_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{event}\t{order_id}\n" for event, order_id in self._keys)
+
+    def contains(self, action, order_id):
+        return (event_name(action), str(order_id)) in self._keys
+
+    def add(self, action, order_id):
+        """Запоминает событие; возвращает False, если оно уже было записано."""
+        key = (event_name(action), str(order_id))
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        with open(self.keys_file, "a", encoding="utf-8") as f:
+            f.write(f"{key[0]}\t{key[1]}\n")
+        return True
@@ -0,0 +1,101 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class MarketSymbol:
+    """Торговая пара с последней ценой сделки."""
+    symbol: str
+    base: str
+    quote: str
+    last_trade: float | None = None
+    info: dict = field(default_factory=dict, repr=False)
+
+
+def _result_list(data):
+    """Достает список записей из ответа API ({"result": [...]} или просто [...])."""
+    if isinstance(data, dict):
+        data = data.get("result")
+    return data if isinstance(data, list) else []
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MarketSnapshot:
+    """Снимок рынка: пары, индексированные по символу, базовой и котируемой валюте."""
+
+    def __init__(self):
+        self.symbols = {}
+        self._by_base = {}
+        self._by_quote = {}
+
+    @classmethod
+    def from_api(cls, symbols_data, prices_data=None):
+        """Строит снимок за один проход по ответам /api/symbols и /api/prices."""
+        snapshot = cls()
+        for item in _result_list(symbols_data):
+            if isinstance(item, dict) and item.get("symbol"):
+                snapshot.add(item)
+        if prices_data is not None:
+            snapshot.update_prices(prices_data)
+        return snapshot
+
+    def add(self, info):
+        """Добавляет пару из записи /api/symbols."""
+        symbol = info["symbol"]
+        base, _, quote = symbol.partition("/")
+        entry = MarketSymbol(
+            symbol=symbol,
+            base=info.get("base") or base,
+            quote=info.get("quote") or quote,
+            info=info,
+        )
+        self.symbols[symbol] = entry
+        self._by_base.setdefault(entry.base, []).append(entry)
+        self._by_quote.setdefault(entry.quote, []).append(entry)
+        return entry
+
+    def update_prices(self, prices_data):
+        """Обновляет последние цены по ответу /api/prices (сопоставление по символу)."""
+        for item in _result_list(prices_data):
+            if not isinstance(item, dict):
+                continue
+            entry = self.symbols.get(item.get("symbol"))
+            if entry is None:
+                continue
+            price = _to_float(item.get("lastTrade"))
+            if price is not None:
+                entry.last_trade = price
+
+    def get(self, symbol):
+        return self.symbols.get(symbol)
+
+    def pairs(self):
+        """Список всех торговых пар."""
+        return list(self.symbols)
+
+    def prices(self):
+        """Последние цены по парам, для которых цена известна."""
+        return {s: e.last_trade for s, e in self.symbols.items() if e.last_trade is not None}
+
+    def bases(self):
+        """Множество базовых валют."""
+        return set(self._by_base)
+
+    def by_base(self, base):
+        return list(self._by_base.get(base, []))
+
+    def by_quote(self, quote):
+        return list(self._by_quote.get(quote, []))
+
+    def low_price_pairs(self, quote, price_limit):
+        """Пары с котируемой валютой quote и последней ценой не выше price_limit."""
+        return {
+            e.symbol: e.last_trade
+            for e in self._by_quote.get(quote, [])
+            if e.last_trade is not None and e.last_trade <= price_limit
+        }
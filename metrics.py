@@ -0,0 +1,271 @@
+import atexit
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ataix_log import get_logger
+
+# Метрики в текстовом формате Prometheus: HTTP-эндпоинт /metrics на локальном
+# порту и/или файл, который периодически перезаписывается (textfile collector).
+# Пример секции config.json: {"metrics": {"port": 9108, "file": "ataix.prom", "interval": 15}}
+
+# Константы
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_INTERVAL = 15
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SCAN_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+FILL_BUCKETS = (60, 300, 900, 3600, 4 * 3600, 12 * 3600, 24 * 3600, 3 * 24 * 3600, 7 * 24 * 3600)
+
+log = get_logger("metrics")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Монотонный счетчик с метками."""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in values]
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}   # метки -> [счетчики корзин..., сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def lines(self):
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_labels(self.labels, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса; render() отдает их в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, help_text, labels, buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Метрики клиента API и сканирований
+REQUESTS = REGISTRY.counter(
+    "ataix_http_requests_total", "Запросы к API биржи", ("method", "endpoint", "status"))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "ataix_http_request_duration_seconds", "Задержка запросов к API биржи", ("method", "endpoint", "status"))
+SCAN_SECONDS = REGISTRY.histogram(
+    "ataix_scan_duration_seconds", "Длительность прохода сканирования", ("scan",), SCAN_BUCKETS)
+ORDERS_CHECKED = REGISTRY.counter("ataix_orders_checked_total", "Ордера, проверенные сканированием", ("scan",))
+ORDERS_FILLED = REGISTRY.counter("ataix_orders_filled_total", "Исполненные ордера, найденные сканированием", ("scan",))
+ORDERS_REPRICED = REGISTRY.counter("ataix_orders_repriced_total", "Ордера, пересозданные по новой цене", ("scan",))
+ORDERS_PLACED = REGISTRY.counter("ataix_orders_placed_total", "Новые ордера, выставленные сканированием", ("scan",))
+FILL_SECONDS = REGISTRY.histogram(
+    "ataix_order_fill_seconds", "Время от создания ордера до исполнения", ("side",), FILL_BUCKETS)
+
+
+def observe_request(endpoint_key, status, elapsed):
+    """Запрос клиента: endpoint_key - "МЕТОД /путь" из ataix_client.endpoint_key, status - код или "error"."""
+    method, _, endpoint = endpoint_key.partition(" ")
+    # Метки - строки: коды и "error" в одной метке иначе не сортируются при выводе
+    status = str(status)
+    REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+    REQUEST_SECONDS.observe(elapsed, method=method, endpoint=endpoint, status=status)
+
+
+def observe_fill(side, created_at, filled_at=None):
+    """Время исполнения ордера по времени создания и исполнения (секунды эпохи).
+
+    Если биржа не сообщила время исполнения, берется момент обнаружения.
+    """
+    if created_at is None:
+        return
+    elapsed = (filled_at if filled_at is not None else time.time()) - created_at
+    if elapsed >= 0:
+        FILL_SECONDS.observe(elapsed, side=side)
+
+
+class ScanMetrics:
+    """Счетчики одного прохода сканирования; finish() переносит их в реестр."""
+
+    def __init__(self, scan):
+        self.scan = scan
+        self.checked = 0
+        self.filled = 0
+        self.repriced = 0
+        self.placed = 0
+        self._started = time.perf_counter()
+
+    def finish(self):
+        SCAN_SECONDS.observe(time.perf_counter() - self._started, scan=self.scan)
+        ORDERS_CHECKED.inc(self.checked, scan=self.scan)
+        ORDERS_FILLED.inc(self.filled, scan=self.scan)
+        ORDERS_REPRICED.inc(self.repriced, scan=self.scan)
+        ORDERS_PLACED.inc(self.placed, scan=self.scan)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Не засоряем вывод строкой на каждый опрос
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port, host=DEFAULT_HOST):
+    """Отдает метрики по http://host:port/metrics из фонового потока; возвращает сервер."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def write_file(path):
+    """Атомарно записывает метрики в файл: сборщик не увидит его наполовину записанным."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(REGISTRY.render())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # Поток записи не должен погибнуть из-за одной неудачной записи
+        log.error("Не удалось записать метрики в %s: %s", path, e)
+
+
+def _write_periodically(path, interval, stop):
+    while not stop.wait(interval):
+        write_file(path)
+
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def setup_metrics(config=None):
+    """Включает экспорт метрик по необязательной секции "metrics" из config.json (один раз на процесс).
+
+    "port" - HTTP-эндпоинт на "host" (по умолчанию 127.0.0.1), "file" - файл,
+    который перезаписывается каждые "interval" секунд и при выходе.
+    """
+    global _started
+    options = (config or {}).get("metrics", {})
+    with _started_lock:
+        if _started or not options:
+            return
+        _started = True
+
+    if options.get("port"):
+        host = options.get("host", DEFAULT_HOST)
+        try:
+            serve(int(options["port"]), host)
+            log.info("Метрики доступны на http://%s:%s/metrics", host, options["port"])
+        except OSError as e:
+            log.error("Не удалось открыть порт метрик %s: %s", options["port"], e)
+
+    if options.get("file"):
+        path = options["file"]
+        stop = threading.Event()
+        interval = float(options.get("interval", DEFAULT_INTERVAL))
+        threading.Thread(target=_write_periodically, args=(path, interval, stop), daemon=True).start()
+
+        def final_write():
+            stop.set()
+            write_file(path)
+
+        atexit.register(final_write)
@@ -0,0 +1,562 @@
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from ataix_client import endpoint_key
+
+# Локальная имитация биржи ATAIX для нагрузочных тестов без реальных ключей и денег.
+# Запуск: python mock_exchange.py --port 8765, затем ATAIX_BASE_URL=http://127.0.0.1:8765
+
+# Константы
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_PAIRS = 50
+DEFAULT_FEE = 0.001            # комиссия с суммы сделки
+DEFAULT_BALANCE = 1_000_000    # стартовый баланс USDT
+DEFAULT_VOLATILITY = 0.5       # среднее изменение цены за шаг рынка, %
+DEFAULT_TICK = 1.0             # шаг рынка, секунды (0 - только через /mock/tick)
+QUOTE = "USDT"
+
+OPEN_STATUSES = ("new", "partiallyFilled")
+
+_ORDER_PATH = re.compile(r"^/api/orders/([^/]+)$")
+_BALANCE_PATH = re.compile(r"^/api/user/balances/([^/]+)$")
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая отдается клиенту с HTTP-статусом."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def price_precision(price):
+    """Число знаков цены: не больше 4 (так округляют скрипты) и не меньше 2."""
+    return 2 if price >= 100 else 4
+
+
+class MockExchange:
+    """Состояние биржи: рынки, балансы и простой движок лимитных ордеров.
+
+    Встречные ордера сводятся по цене и времени. Кроме того, рыночная цена
+    каждой пары случайно блуждает, и ордер, через цену которого она прошла,
+    исполняется по своей цене - так неисполненные ордера со временем
+    исполняются и без встречных заявок.
+    """
+
+    def __init__(self, pairs=DEFAULT_PAIRS, fee=DEFAULT_FEE, balance=DEFAULT_BALANCE,
+                 volatility=DEFAULT_VOLATILITY, seed=None):
+        self.random = random.Random(seed)
+        self.fee = fee
+        self.volatility = volatility / 100
+        self.markets = {}
+        self.orders = {}
+        self.books = defaultdict(list)          # символ -> ID открытых ордеров по времени
+        self.available = defaultdict(float)
+        self.reserved = defaultdict(float)
+        self.available[QUOTE] = float(balance)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._create_markets(pairs)
+
+    def _create_markets(self, count):
+        seeds = [("BTC", 65000.0), ("ETH", 3000.0)]
+        seeds += [(f"TKN{i}", round(math.exp(self.random.uniform(math.log(0.01), math.log(50))), 4))
+                  for i in range(max(0, count - len(seeds)))]
+        for base, price in seeds[:count]:
+            symbol = f"{base}/{QUOTE}"
+            self.markets[symbol] = {
+                "symbol": symbol,
+                "base": base,
+                "quote": QUOTE,
+                "pricePrecision": price_precision(price),
+                "quantityPrecision": 6 if price >= 100 else 2,
+                "minTradeSize": 0.0001 if price >= 100 else 0.01,
+                "lastTrade": price,
+            }
+
+    # Справочники
+
+    def symbols(self):
+        return [{k: v for k, v in m.items() if k != "lastTrade"} for m in self.markets.values()]
+
+    def currencies(self):
+        codes = [QUOTE] + [m["base"] for m in self.markets.values()]
+        return [{"currency": c, "name": c, "precision": 8} for c in codes]
+
+    def prices(self):
+        with self._lock:
+            result = []
+            for m in self.markets.values():
+                step = 10 ** -m["pricePrecision"]
+                result.append({
+                    "symbol": m["symbol"],
+                    "lastTrade": m["lastTrade"],
+                    "bid": round(m["lastTrade"] - step, m["pricePrecision"]),
+                    "ask": round(m["lastTrade"] + step, m["pricePrecision"]),
+                })
+            return result
+
+    def balance(self, currency):
+        with self._lock:
+            return {
+                "currency": currency,
+                "available": f"{self.available[currency]:.8f}",
+                "onOrders": f"{self.reserved[currency]:.8f}",
+            }
+
+    def balances(self):
+        with self._lock:
+            codes = set(self.available) | set(self.reserved)
+        return [self.balance(c) for c in sorted(codes)]
+
+    # Ордера
+
+    def place(self, data):
+        symbol = data.get("symbol")
+        side = str(data.get("side", "")).lower()
+        market = self.markets.get(symbol)
+        if market is None:
+            raise ApiError(400, f"Неизвестная пара {symbol}")
+        if side not in ("buy", "sell"):
+            raise ApiError(400, "side должен быть buy или sell")
+        if str(data.get("type", "limit")).lower() != "limit":
+            raise ApiError(400, "Поддерживаются только лимитные ордера")
+        try:
+            price = round(float(data["price"]), market["pricePrecision"])
+            quantity = float(data["quantity"])
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400, "Некорректные price или quantity")
+        if price <= 0 or quantity < market["minTradeSize"]:
+            raise ApiError(400, "Цена или количество меньше допустимого")
+
+        with self._lock:
+            currency, amount = self._reserve_amount(market, side, price, quantity)
+            if self.available[currency] + 1e-9 < amount:
+                raise ApiError(400, f"Недостаточно средств {currency}")
+            self.available[currency] -= amount
+            self.reserved[currency] += amount
+
+            created = now_iso()
+            order = {
+                "orderID": f"mock-{next(self._ids)}",
+                "symbol": symbol,
+                "side": side,
+                "type": "limit",
+                "price": price,
+                "quantity": quantity,
+                "cumQuantity": 0.0,
+                "averagePrice": 0.0,
+                "cumCommission": 0.0,
+                "status": "new",
+                "created": created,
+                "updated": created,
+            }
+            self.orders[order["orderID"]] = order
+            self._match(order)
+            if order["status"] in OPEN_STATUSES:
+                self._cross_market(order)
+            if order["status"] in OPEN_STATUSES:
+                self.books[symbol].append(order["orderID"])
+            return dict(order)
+
+    def list_orders(self, limit=100, offset=0, status=None):
+        """Ордера аккаунта от новых к старым, постранично."""
+        with self._lock:
+            orders = [o for o in reversed(list(self.orders.values())) if status is None or o["status"] == status]
+            return [dict(o) for o in orders[offset:offset + limit]]
+
+    def get_order(self, order_id):
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                raise ApiError(404, f"Ордер {order_id} не найден")
+            return dict(order)
+
+    def cancel(self, order_id):
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                raise ApiError(404, f"Ордер {order_id} не найден")
+            if order["status"] not in OPEN_STATUSES:
+                raise ApiError(400, f"Ордер {order_id} в статусе {order['status']}, отмена невозможна")
+            market = self.markets[order["symbol"]]
+            remaining = order["quantity"] - order["cumQuantity"]
+            currency, amount = self._reserve_amount(market, order["side"], order["price"], remaining)
+            self.reserved[currency] -= amount
+            self.available[currency] += amount
+            order["status"] = "cancelled"
+            order["updated"] = now_iso()
+            self.books[order["symbol"]].remove(order_id)
+            return dict(order)
+
+    def _reserve_amount(self, market, side, price, quantity):
+        if side == "buy":
+            return market["quote"], price * quantity * (1 + self.fee)
+        return market["base"], quantity
+
+    def _fill(self, order, quantity, price):
+        """Исполняет часть ордера по цене price и переносит средства между валютами."""
+        market = self.markets[order["symbol"]]
+        notional = quantity * price
+        commission = notional * self.fee
+        if order["side"] == "buy":
+            reserved = order["price"] * quantity * (1 + self.fee)
+            self.reserved[market["quote"]] -= reserved
+            self.available[market["quote"]] += reserved - notional - commission
+            self.available[market["base"]] += quantity
+        else:
+            self.reserved[market["base"]] -= quantity
+            self.available[market["quote"]] += notional - commission
+
+        filled = order["cumQuantity"] + quantity
+        order["averagePrice"] = round((order["averagePrice"] * order["cumQuantity"] + notional) / filled, 8)
+        order["cumQuantity"] = round(filled, 8)
+        order["cumCommission"] = round(order["cumCommission"] + commission, 8)
+        order["status"] = "filled" if filled >= order["quantity"] - 1e-12 else "partiallyFilled"
+        order["updated"] = now_iso()
+        market["lastTrade"] = price
+
+    def _match(self, order):
+        """Сводит новый ордер со встречными открытыми ордерами (цена-время)."""
+        book = self.books[order["symbol"]]
+        opposite = "sell" if order["side"] == "buy" else "buy"
+        candidates = [self.orders[i] for i in book if self.orders[i]["side"] == opposite]
+        if order["side"] == "buy":
+            candidates = sorted((o for o in candidates if o["price"] <= order["price"]), key=lambda o: o["price"])
+        else:
+            candidates = sorted((o for o in candidates if o["price"] >= order["price"]), key=lambda o: -o["price"])
+
+        for resting in candidates:
+            quantity = min(order["quantity"] - order["cumQuantity"], resting["quantity"] - resting["cumQuantity"])
+            if quantity <= 0:
+                break
+            self._fill(resting, quantity, resting["price"])
+            self._fill(order, quantity, resting["price"])
+            if resting["status"] == "filled":
+                book.remove(resting["orderID"])
+            if order["status"] == "filled":
+                break
+
+    def _cross_market(self, order, price=None):
+        """Исполняет остаток ордера, если рыночная цена дошла до его цены."""
+        market = self.markets[order["symbol"]]
+        last = market["lastTrade"] if price is None else price
+        if (order["side"] == "buy" and last <= order["price"]) or (order["side"] == "sell" and last >= order["price"]):
+            # Новый ордер исполняется по рынку, старый - по своей цене
+            fill_price = last if price is None else order["price"]
+            self._fill(order, order["quantity"] - order["cumQuantity"], fill_price)
+
+    def tick(self, steps=1):
+        """Сдвигает рыночные цены на steps шагов и исполняет пересеченные ордера."""
+        filled = 0
+        with self._lock:
+            for _ in range(steps):
+                for symbol, market in self.markets.items():
+                    change = math.exp(self.random.gauss(0, self.volatility))
+                    price = round(max(10 ** -market["pricePrecision"], market["lastTrade"] * change),
+                                  market["pricePrecision"])
+                    market["lastTrade"] = price
+                    book = self.books[symbol]
+                    for order_id in list(book):
+                        order = self.orders[order_id]
+                        self._cross_market(order, price)
+                        if order["status"] == "filled":
+                            book.remove(order_id)
+                            filled += 1
+                    market["lastTrade"] = price
+        return filled
+
+    def fill_random(self, fraction):
+        """Исполняет по своей цене случайную долю открытых ордеров (для тестов)."""
+        filled = 0
+        with self._lock:
+            for symbol, book in self.books.items():
+                for order_id in list(book):
+                    if self.random.random() < fraction:
+                        order = self.orders[order_id]
+                        self._fill(order, order["quantity"] - order["cumQuantity"], order["price"])
+                        book.remove(order_id)
+                        filled += 1
+        return filled
+
+    def summary(self):
+        with self._lock:
+            statuses = Counter(o["status"] for o in self.orders.values())
+            return {"orders": len(self.orders), "statuses": dict(statuses)}
+
+
+class Faults:
+    """Имитация задержек, ошибок и лимита частоты (429) на стороне биржи."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, rate_limit=0, retry_after=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def throttled(self):
+        """True, если запрос нужно отклонить с 429."""
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            return True
+        if self.rate_limit <= 0:
+            return False
+        with self._lock:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window, self._count = window, 0
+            self._count += 1
+            return self._count > self.rate_limit
+
+    def failed(self):
+        return bool(self.error_rate) and random.random() < self.error_rate
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, exchange, faults=None, api_key=None):
+        super().__init__(address, MockHandler)
+        self.exchange = exchange
+        self.faults = faults or Faults()
+        self.api_key = api_key
+        self.requests = Counter()
+        self.responses = Counter()
+        self._stats_lock = threading.Lock()
+
+    def count(self, method, path, status):
+        with self._stats_lock:
+            key = endpoint_key(method, path)
+            self.requests[key] += 1
+            self.responses[f"{key} {status}"] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {"requests": dict(self.requests), "responses": dict(self.responses), **self.exchange.summary()}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.requests.clear()
+            self.responses.clear()
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Заголовки и тело уходят отдельными пакетами; без TCP_NODELAY
+        # каждый ответ ждал бы отложенного ACK (~40 мс)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass  # Не засоряем вывод строкой на каждый запрос
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        body = self._read_body()
+
+        if path.startswith("/mock/"):
+            self._handle_control(method, path, url.query, body)
+            return
+
+        server = self.server
+        server.faults.delay()
+        if server.faults.throttled():
+            self._send(429, {"status": False, "message": "Too Many Requests"},
+                       {"Retry-After": str(server.faults.retry_after)}, method, path)
+            return
+        if server.faults.failed():
+            self._send(random.choice((500, 502, 503)), {"status": False, "message": "Injected error"},
+                       method=method, path=path)
+            return
+
+        try:
+            if server.api_key and (path.startswith("/api/user") or path.startswith("/api/orders")) \
+                    and self.headers.get("X-API-Key") != server.api_key:
+                raise ApiError(401, "Неверный API-ключ")
+            status, payload = self._route(method, path, body, parse_qs(url.query))
+        except ApiError as e:
+            status, payload = e.status, {"status": False, "message": e.message}
+        self._send(status, payload, method=method, path=path)
+
+    def _route(self, method, path, body, query):
+        exchange = self.server.exchange
+        if method == "GET" and path == "/api/symbols":
+            return self._static(exchange.symbols())
+        if method == "GET" and path == "/api/currencies":
+            return self._static(exchange.currencies())
+        if method == "GET" and path == "/api/prices":
+            return 200, {"status": True, "result": exchange.prices()}
+        if method == "GET" and path == "/api/user/info":
+            return 200, {"status": True, "result": {"id": "mock", "permissions": ["read", "trade"]}}
+        if method == "GET" and path == "/api/user/orders":
+            try:
+                limit = min(1000, int(query.get("limit", ["100"])[-1]))
+                offset = int(query.get("offset", ["0"])[-1])
+            except ValueError:
+                raise ApiError(400, "Некорректные limit или offset")
+            status = query.get("status", [None])[-1]
+            return 200, {"status": True, "result": exchange.list_orders(limit, offset, status)}
+        if method == "GET" and path == "/api/user/balances":
+            return 200, {"status": True, "result": exchange.balances()}
+        if method == "GET" and (m := _BALANCE_PATH.match(path)):
+            return 200, {"status": True, **exchange.balance(m.group(1))}
+        if method == "POST" and path == "/api/orders":
+            if not isinstance(body, dict):
+                raise ApiError(400, "Ожидается JSON-объект ордера")
+            return 200, {"status": True, "result": exchange.place(body)}
+        if m := _ORDER_PATH.match(path):
+            if method == "GET":
+                return 200, {"status": True, "result": exchange.get_order(m.group(1))}
+            if method == "DELETE":
+                return 200, {"status": True, "result": exchange.cancel(m.group(1))}
+        raise ApiError(404, f"{method} {path} не поддерживается")
+
+    def _static(self, result):
+        """Ответ справочника с ETag; при совпадении If-None-Match - 304."""
+        payload = {"status": True, "result": result}
+        etag = '"%s"' % hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        self._etag = etag
+        if self.headers.get("If-None-Match") == etag:
+            return 304, None
+        return 200, payload
+
+    def _handle_control(self, method, path, query, body):
+        """Служебные эндпоинты: статистика, сдвиг рынка, принудительное исполнение."""
+        server = self.server
+        params = body if isinstance(body, dict) else {}
+        params.update({k: v[-1] for k, v in parse_qs(query).items()})
+        if path == "/mock/stats" and method == "GET":
+            self._send(200, server.stats())
+        elif path == "/mock/stats" and method == "DELETE":
+            server.reset_stats()
+            self._send(200, {"status": True})
+        elif path == "/mock/tick" and method == "POST":
+            self._send(200, {"filled": server.exchange.tick(int(params.get("steps", 1)))})
+        elif path == "/mock/fill" and method == "POST":
+            self._send(200, {"filled": server.exchange.fill_random(float(params.get("fraction", 1.0)))})
+        else:
+            self._send(404, {"status": False, "message": f"{method} {path} не поддерживается"})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return None
+        raw = self.rfile.read(length)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    def _send(self, status, payload, headers=None, method=None, path=None):
+        if method:
+            self.server.count(method, path, status)
+        data = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if getattr(self, "_etag", None):
+            self.send_header("ETag", self._etag)
+            self._etag = None
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+
+def start_market(exchange, interval):
+    """Фоновый поток, который сдвигает рынок каждые interval секунд."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            exchange.tick()
+
+    if interval > 0:
+        threading.Thread(target=run, daemon=True).start()
+    return stop
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, exchange=None, faults=None, tick=DEFAULT_TICK, api_key=None):
+    """Запускает сервер в фоновом потоке; возвращает (server, base_url)."""
+    server = MockServer((host, port), exchange or MockExchange(), faults, api_key)
+    server.market_stop = start_market(server.exchange, tick)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная имитация биржи ATAIX")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pairs", type=int, default=DEFAULT_PAIRS, help="количество торговых пар")
+    parser.add_argument("--balance", type=float, default=DEFAULT_BALANCE, help="стартовый баланс USDT")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE, help="комиссия (доля от суммы сделки)")
+    parser.add_argument("--volatility", type=float, default=DEFAULT_VOLATILITY, help="изменение цены за шаг, %%")
+    parser.add_argument("--tick", type=float, default=DEFAULT_TICK, help="шаг рынка, с (0 - только /mock/tick)")
+    parser.add_argument("--seed", type=int, help="зерно генератора для воспроизводимости")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, мс")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, мс")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 5xx")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--rate-limit", type=int, default=0, help="запросов в секунду до ответа 429 (0 - без лимита)")
+    parser.add_argument("--retry-after", type=int, default=1, help="значение Retry-After для 429, с")
+    parser.add_argument("--api-key", help="требовать этот X-API-Key для /api/user и /api/orders")
+    args = parser.parse_args()
+
+    exchange = MockExchange(args.pairs, args.fee, args.balance, args.volatility, args.seed)
+    faults = Faults(args.latency / 1000, args.jitter / 1000, args.error_rate,
+                    args.throttle_rate, args.rate_limit, args.retry_after)
+    server, base_url = serve(args.host, args.port, exchange, faults, args.tick, args.api_key)
+    print(f"[INFO] Имитация биржи запущена: {base_url}")
+    print(f"[INFO] Для скриптов: ATAIX_BASE_URL={base_url} или \"base_url\" в config.json")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("\n[INFO] Остановлено.")
+    finally:
+        server.market_stop.set()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+
+
+def _text(value):
+    return str(value)
+
+
+def _lower(value):
+    return str(value).lower()
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_time(value):
+    """Время ISO-8601 из API ("2024-01-01T10:00:00.000Z") в секундах эпохи или None."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value[:-1] if value.endswith("Z") else value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def fmt_number(value):
+    """Число для history.txt в десятичной записи: 0.00005, а не 5e-05 (Step5 не читает экспоненту)."""
+    return format(Decimal(str(value)), "f")
+
+
+# Ключ API / orders.db -> (поле Order, преобразование). Прочие ключи ответа API не хранятся
+_FIELDS = {
+    "orderID": ("order_id", _text),
+    "originalID": ("original_id", _text),
+    "symbol": ("symbol", _text),
+    "side": ("side", _lower),
+    "status": ("status", _lower),
+    "price": ("price", _float),
+    "quantity": ("quantity", _float),
+    "cumQuantity": ("cum_quantity", _float),
+    "averagePrice": ("average_price", _float),
+    "cumCommission": ("cum_commission", _float),
+    "created": ("created", _text),
+    "repriceCount": ("reprice_count", _int),
+    "is_recreated": ("is_recreated", bool),
+    "reconciled": ("reconciled", bool),
+}
+
+
+@dataclass(slots=True)
+class Order:
+    """Отслеживаемый ордер с числовыми полями, разобранными один раз при чтении.
+
+    Строится из ответа API или записи orders.db методом from_api; обратно в
+    формат orders.db и orders_data.json переводится методом to_dict. Статус
+    и сторона хранятся в нижнем регистре.
+    """
+    order_id: str
+    original_id: str = ""
+    symbol: str = ""
+    side: str = "buy"
+    status: str = "new"
+    price: float = 0.0
+    quantity: float = 0.0
+    cum_quantity: float = 0.0
+    average_price: float = 0.0
+    cum_commission: float = 0.0
+    created: str = ""
+    reprice_count: int = 0
+    is_recreated: bool = False
+    reconciled: bool = False
+
+    @classmethod
+    def from_api(cls, data):
+        """Ордер из словаря API; originalID по умолчанию совпадает с orderID."""
+        order = cls("").update(data)
+        if not order.original_id:
+            order.original_id = order.order_id
+        return order
+
+    def update(self, data):
+        """Обновляет поля из словаря API (только присутствующие ключи); возвращает self."""
+        for key, value in data.items():
+            field = _FIELDS.get(key)
+            if field is not None and value is not None:
+                setattr(self, field[0], field[1](value))
+        return self
+
+    @property
+    def fill_price(self):
+        """Средняя цена исполнения, если она известна, иначе цена ордера."""
+        return self.average_price or self.price
+
+    def to_dict(self):
+        """Словарь в формате orders_data.json."""
+        data = {
+            "orderID": self.order_id,
+            "originalID": self.original_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "status": self.status,
+            "price": self.price,
+            "quantity": self.quantity,
+            "cumQuantity": self.cum_quantity,
+            "averagePrice": self.average_price,
+            "cumCommission": self.cum_commission,
+            "created": self.created,
+        }
+        if self.reprice_count:
+            data["repriceCount"] = self.reprice_count
+        if self.is_recreated:
+            data["is_recreated"] = True
+        if self.reconciled:
+            data["reconciled"] = True
+        return data
@@ -0,0 +1,62 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from ataix_log import get_logger
+from order_model import Order
+
+log = get_logger("ops")
+
+
+@dataclass
+class Replacement:
+    """Результат замены ордера: отмена старого и выставление нового.
+
+    cancelled - данные отмененного ордера из ответа DELETE (None, если
+    отмена не удалась), new_order - новый ордер (None, если не создан).
+    """
+    order: Order
+    new_price: float
+    cancelled: dict | None = None
+    new_order: Order | None = None
+
+
+def replace_order(client, order, new_price, create_order):
+    """Отменяет ордер и сразу выставляет новый: два запроса без повторного GET.
+
+    create_order(order, new_price) выставляет новый ордер и возвращает его
+    (Order) или None. Если отмена не удалась (например, ордер уже исполнен),
+    новый ордер не создается.
+    """
+    order_id = order.order_id
+    response = client.delete(f"/api/orders/{order_id}")
+    if not response:
+        log.warning("Не удалось отменить ордер %s, замена пропущена", order_id)
+        return Replacement(order, new_price)
+
+    result = response.get("result") if isinstance(response, dict) else None
+    cancelled = result if isinstance(result, dict) else {}
+    return Replacement(order, new_price, cancelled, create_order(order, new_price))
+
+
+def replace_orders(client, replacements, create_order, max_workers=None):
+    """Пакетная замена ордеров: пары (ордер, новая цена) обрабатываются параллельно.
+
+    Каждая замена выполняет отмену и выставление подряд; частоту запросов
+    ограничивает лимитер клиента. Возвращает список Replacement в исходном порядке.
+    """
+    replacements = list(replacements)
+    if not replacements:
+        return []
+    workers = min(max_workers or client.max_workers, len(replacements))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: replace_order(client, item[0], item[1], create_order), replacements))
+
+
+def commit_replacements(store, results):
+    """Сохраняет итог замен одной транзакцией: старые ордера удаляются, новые добавляются."""
+    with store.transaction():
+        for result in results:
+            if result.cancelled is not None:
+                store.remove(result.order.order_id)
+            if result.new_order:
+                store.add(result.new_order)
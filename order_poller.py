@@ -0,0 +1,77 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ataix_log import get_logger
+
+log = get_logger("poller")
+
+# Маркер окончания потока результатов
+_DONE = object()
+
+
+async def poll_order_statuses(client, order_ids, concurrency=None):
+    """Асинхронно запрашивает статусы ордеров и отдает их по мере получения.
+
+    Возвращает пары (order_id, ответ API или None). Одновременно выполняется
+    не более concurrency запросов (по умолчанию client.max_workers).
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+
+    concurrency = max(1, concurrency or client.max_workers)
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(order_ids))) as executor:
+        async def fetch(order_id):
+            async with semaphore:
+                response = await loop.run_in_executor(executor, client.get, f"/api/orders/{order_id}")
+                return order_id, response
+
+        tasks = [asyncio.ensure_future(fetch(order_id)) for order_id in order_ids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def iter_order_statuses(client, order_ids, concurrency=None, snapshot=None):
+    """Синхронная обертка над poll_order_statuses для обычных циклов сканирования.
+
+    Опрос идет в фоновом потоке, поэтому обработка первых ответов
+    начинается, не дожидаясь самых медленных. Ордера из snapshot
+    ({orderID: ордер}, например из reconcile.fetch_snapshot) отдаются без
+    запроса, остальные запрашиваются по одному.
+    """
+    order_ids = list(order_ids)
+    if snapshot:
+        for order_id in order_ids:
+            if order_id in snapshot:
+                yield order_id, {"status": True, "result": snapshot[order_id]}
+        order_ids = [order_id for order_id in order_ids if order_id not in snapshot]
+        if not order_ids:
+            return
+
+    results = queue.Queue()
+
+    async def produce():
+        async for item in poll_order_statuses(client, order_ids, concurrency):
+            results.put(item)
+
+    def run():
+        try:
+            asyncio.run(produce())
+        except Exception as e:
+            log.error("Ошибка при опросе статусов ордеров: %s", e)
+        finally:
+            results.put(_DONE)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    while (item := results.get()) is not _DONE:
+        yield item
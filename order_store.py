@@ -0,0 +1,266 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from ataix_log import get_logger
+from order_model import Order
+
+# Константы
+ORDERS_DB = "orders.db"
+ORDERS_FILE = "orders_data.json"
+
+log = get_logger("store")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    orderID    TEXT PRIMARY KEY,
+    originalID TEXT,
+    side       TEXT NOT NULL DEFAULT 'buy',
+    status     TEXT NOT NULL DEFAULT '',
+    symbol     TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_original ON orders (originalID);
+CREATE INDEX IF NOT EXISTS idx_orders_side ON orders (side);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+"""
+
+
+def _load(data):
+    return Order.from_api(json.loads(data))
+
+
+class OrderStore:
+    """Хранилище отслеживаемых ордеров во встроенной базе SQLite (режим WAL).
+
+    Ордера хранятся в том же виде, что и в orders_data.json; файл JSON
+    остается форматом импорта/экспорта. Читаются и записываются объекты Order.
+    """
+
+    def __init__(self, path=ORDERS_DB, json_path=ORDERS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        is_new = not os.path.exists(path)
+
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # При первом запуске переносим ордера из orders_data.json
+        if is_new and json_path and os.path.exists(json_path):
+            count = self.import_json(json_path)
+            if count:
+                log.info("Импортировано ордеров из %s: %s", json_path, count)
+
+    @contextmanager
+    def transaction(self):
+        """Объединяет изменения в одну транзакцию (вложенные вызовы допустимы)."""
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if outer:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if outer:
+                self._conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def all(self, side=None, status=None):
+        """Список ордеров в порядке добавления, с необязательным фильтром."""
+        sql = "SELECT data FROM orders"
+        conditions, params = [], []
+        if side is not None:
+            conditions.append("side = ?")
+            params.append(side.lower())
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status.lower())
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid"
+        return [_load(row[0]) for row in self._query(sql, params)]
+
+    def by_original(self, original_id):
+        rows = self._query("SELECT data FROM orders WHERE originalID = ? ORDER BY rowid", (original_id,))
+        return [_load(row[0]) for row in rows]
+
+    def get(self, order_id):
+        rows = self._query("SELECT data FROM orders WHERE orderID = ?", (order_id,))
+        return _load(rows[0][0]) if rows else None
+
+    def put(self, order):
+        """Добавляет ордер (Order или словарь API) или полностью заменяет сохраненный с тем же orderID."""
+        if not isinstance(order, Order):
+            order = Order.from_api(order)
+        with self.transaction():
+            self._conn.execute(
+                "INSERT INTO orders (orderID, originalID, side, status, symbol, data) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(orderID) DO UPDATE SET originalID = excluded.originalID, "
+                "side = excluded.side, status = excluded.status, "
+                "symbol = excluded.symbol, data = excluded.data",
+                (order.order_id, order.original_id, order.side, order.status, order.symbol,
+                 json.dumps(order.to_dict(), ensure_ascii=False)),
+            )
+
+    add = put
+
+    def add_many(self, orders):
+        with self.transaction():
+            for order in orders:
+                self.put(order)
+
+    def update(self, order_id, fields):
+        """Обновляет поля ордера словарем fields с ключами API; возвращает обновленный ордер или None."""
+        with self.transaction():
+            order = self.get(order_id)
+            if order is None:
+                return None
+            order.update(fields)
+            self.put(order)
+            return order
+
+    def remove(self, order_id):
+        """Удаляет ордер; возвращает True, если он был в хранилище."""
+        with self.transaction():
+            cursor = self._conn.execute("DELETE FROM orders WHERE orderID = ?", (order_id,))
+            return cursor.rowcount > 0
+
+    def import_json(self, json_path=ORDERS_FILE):
+        """Загружает ордера из файла в формате orders_data.json."""
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                orders = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            log.error("Не удалось прочитать %s: %s", json_path, e)
+            return 0
+        orders = [o for o in orders if isinstance(o, dict) and o.get("orderID")]
+        self.add_many(orders)
+        return len(orders)
+
+    def export_json(self, json_path=ORDERS_FILE):
+        """Сохраняет все ордера в файл в формате orders_data.json.
+
+        Запись атомарная: временный файл сбрасывается на диск и заменяет
+        прежний, так что прерванная выгрузка не оставляет обрезанный JSON.
+        """
+        orders = self.all()
+        tmp_path = f"{json_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([order.to_dict() for order in orders], f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, json_path)
+        return len(orders)
+
+    @contextmanager
+    def working_set(self, side=None, status=None):
+        """Рабочий набор ордеров на один проход сканирования (см. WorkingSet).
+
+        Изменения записываются при выходе из блока, в том числе после
+        исключения: ордера, уже отмененные или созданные на бирже, не
+        должны потеряться.
+        """
+        orders = WorkingSet(self, side, status)
+        try:
+            yield orders
+        finally:
+            orders.flush()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WorkingSet:
+    """Ордера одного прохода в памяти с буфером изменений.
+
+    Ордера читаются из хранилища один раз; add, update и remove меняют
+    только набор в памяти, а flush записывает все изменения одной
+    транзакцией. Число записей в базу за проход не зависит от числа
+    исполненных ордеров.
+    """
+
+    def __init__(self, store, side=None, status=None):
+        self.store = store
+        self.orders = {order.order_id: order for order in store.all(side=side, status=status)}
+        self._changed = {}
+        self._removed = set()
+
+    def __iter__(self):
+        return iter(list(self.orders.values()))
+
+    def __len__(self):
+        return len(self.orders)
+
+    def get(self, order_id):
+        return self.orders.get(order_id)
+
+    def add(self, order):
+        """Добавляет ордер или отмечает измененным уже загруженный."""
+        self.orders[order.order_id] = order
+        self._changed[order.order_id] = order
+        self._removed.discard(order.order_id)
+
+    def update(self, order_id, fields):
+        """Обновляет поля ордера словарем fields с ключами API; возвращает ордер или None."""
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        self.add(order.update(fields))
+        return order
+
+    def remove(self, order_id):
+        """Удаляет ордер; возвращает True, если он был в наборе."""
+        self._changed.pop(order_id, None)
+        self._removed.add(order_id)
+        return self.orders.pop(order_id, None) is not None
+
+    @property
+    def pending(self):
+        return len(self._changed) + len(self._removed)
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией; возвращает их количество."""
+        count = self.pending
+        if count:
+            with self.store.transaction():
+                for order_id in self._removed:
+                    self.store.remove(order_id)
+                for order in self._changed.values():
+                    self.store.put(order)
+            log.debug("Записано изменений ордеров: %s", count)
+        self._changed.clear()
+        self._removed.clear()
+        return count
+
+
+# Импорт/экспорт из командной строки:
+#   python order_store.py export [файл]
+#   python order_store.py import [файл]
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "import"):
+        print("Использование: python order_store.py export|import [файл]")
+        sys.exit(1)
+
+    target = sys.argv[2] if len(sys.argv) > 2 else ORDERS_FILE
+    store = OrderStore(json_path=None)
+    if sys.argv[1] == "export":
+        print(f"Экспортировано ордеров в {target}: {store.export_json(target)}")
+    else:
+        print(f"Импортировано ордеров из {target}: {store.import_json(target)}")
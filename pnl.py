@@ -0,0 +1,134 @@
+import numpy as np
+
+# Коды сторон сделки
+BUY = 1
+SELL = -1
+OTHER = 0
+
+
+def event_side(event):
+    """Сторона события истории: "ПОКУПКА" - покупка, "Продажа" - продажа, иначе прочее."""
+    event = event.lower()
+    if "покупка" in event:
+        return BUY
+    if "продажа" in event:
+        return SELL
+    return OTHER
+
+
+class HistoryColumns:
+    """События истории в колоночном виде (массивы NumPy).
+
+    originalID и символы хранятся кодами - индексами в списках original_ids и symbols.
+    """
+
+    def __init__(self, price, qty, commission, side, time, original, symbol, original_ids, symbols):
+        self.price = price
+        self.qty = qty
+        self.commission = commission
+        self.side = side
+        self.time = time
+        self.original = original
+        self.symbol = symbol
+        self.original_ids = original_ids
+        self.symbols = symbols
+
+    @classmethod
+    def from_events(cls, events):
+        """Строит колонки из списка разобранных строк истории (parse_order_line)."""
+        original_codes, symbol_codes = {}, {}
+        price, qty, commission, side, time, original, symbol = [], [], [], [], [], [], []
+
+        for order in events:
+            price.append(order["цена"])
+            qty.append(order["кол-во"])
+            commission.append(order["комиссия"])
+            side.append(event_side(order["событие"]))
+            time.append(order["время"])
+            original.append(original_codes.setdefault(order["originalID"], len(original_codes)))
+            symbol.append(symbol_codes.setdefault(order["символ"], len(symbol_codes)))
+
+        return cls(
+            price=np.asarray(price, dtype=np.float64),
+            qty=np.asarray(qty, dtype=np.float64),
+            commission=np.asarray(commission, dtype=np.float64),
+            side=np.asarray(side, dtype=np.int8),
+            time=np.asarray(time, dtype="datetime64[ms]"),
+            original=np.asarray(original, dtype=np.int64),
+            symbol=np.asarray(symbol, dtype=np.int64),
+            original_ids=list(original_codes),
+            symbols=list(symbol_codes),
+        )
+
+
+def _sum_by(codes, weights, size):
+    return np.bincount(codes, weights=weights, minlength=size)
+
+
+class GroupTotals:
+    """Итоги пачки событий по originalID, посчитанные векторно.
+
+    Все величины аддитивны, поэтому итоги новой пачки прибавляются к
+    сохраненным итогам прошлых отчетов (см. report_store.ReportStore).
+    """
+
+    def __init__(self, columns):
+        n = len(columns.original_ids)
+        codes = columns.original
+        is_buy = columns.side == BUY
+        is_sell = columns.side == SELL
+        is_trade = is_buy | is_sell
+        notional = columns.price * columns.qty
+
+        self.buys = _sum_by(codes, is_buy, n).astype(np.int64)
+        self.sells = _sum_by(codes, is_sell, n).astype(np.int64)
+        self.spent = _sum_by(codes, np.where(is_buy, notional + columns.commission, 0.0), n)
+        self.income = _sum_by(codes, np.where(is_sell, notional - columns.commission, 0.0), n)
+        self.fees = _sum_by(codes, np.where(is_trade, columns.commission, 0.0), n)
+        self.turnover = _sum_by(codes, np.where(is_trade, notional, 0.0), n)
+
+        # Символ, первое и последнее время для каждого originalID
+        self.symbol = np.full(n, -1, dtype=np.int64)
+        self.symbol[codes] = columns.symbol
+        ms = columns.time.astype(np.int64)
+        first = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        last = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(first, codes, ms)
+        np.maximum.at(last, codes, ms)
+        self.first = first.astype("datetime64[ms]")
+        self.last = last.astype("datetime64[ms]")
+
+        self.original_ids = columns.original_ids
+        self.symbols = columns.symbols
+
+    @classmethod
+    def from_events(cls, events):
+        return cls(HistoryColumns.from_events(events))
+
+    def rows(self):
+        """Итоги строками (originalID, символ, покупки, продажи, spent, income, fees, turnover, first, last)."""
+        first = np.datetime_as_string(self.first, unit="ms")
+        last = np.datetime_as_string(self.last, unit="ms")
+        for i, originalID in enumerate(self.original_ids):
+            yield (originalID, self.symbols[self.symbol[i]], int(self.buys[i]), int(self.sells[i]),
+                   float(self.spent[i]), float(self.income[i]), float(self.fees[i]), float(self.turnover[i]),
+                   str(first[i]), str(last[i]))
+
+
+def percent(profit, spent):
+    """Доходность в процентах от затрат (0, если затрат нет)."""
+    return profit / spent * 100 if spent else 0.0
+
+
+def cycle_totals(buys, sells, spent, income, fees, turnover):
+    """Итоги одного originalID по сохраненным суммам."""
+    profit = income - spent
+    return {
+        "balanced": buys == sells,
+        "spent": spent,
+        "income": income,
+        "fees": fees,
+        "turnover": turnover,
+        "profit": profit,
+        "percent": percent(profit, spent),
+    }
@@ -0,0 +1,202 @@
+import threading
+import time
+from dataclasses import dataclass
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP, Decimal, InvalidOperation
+
+from ataix_log import get_logger
+from market import _result_list
+
+# Константы
+SYMBOLS_ENDPOINT = "/api/symbols"
+DEFAULT_PRICE_DECIMALS = 4      # прежнее округление скриптов для пар без описания в /api/symbols
+DEFAULT_TICK = Decimal(1).scaleb(-DEFAULT_PRICE_DECIMALS)
+RELOAD_INTERVAL = 60            # пауза между попытками загрузить /api/symbols после сбоя, секунды
+
+# Направления округления цены: к ближайшему шагу, вверх (покупка дороже) и вниз (продажа дешевле)
+NEAREST = ROUND_HALF_UP
+UP = ROUND_CEILING
+DOWN = ROUND_FLOOR
+
+log = get_logger("precision")
+
+
+def to_decimal(value):
+    """Decimal из числа или строки API или None.
+
+    float переводится через str: Decimal(0.1) тянет за собой двоичную
+    погрешность, а Decimal("0.1") - нет.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        result = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return result if result.is_finite() else None
+
+
+def apply_pct(price, pct):
+    """Цена, измененная на pct процентов, без потери точности."""
+    return to_decimal(price) * (1 + to_decimal(pct) / 100)
+
+
+def snap(value, increment, rounding=NEAREST):
+    """Приводит value к кратному increment с заданным направлением округления."""
+    return ((value / increment).to_integral_value(rounding) * increment).quantize(increment)
+
+
+def _increment(info, size_key, precision_key):
+    """Шаг из явного размера (tickSize) или из числа знаков после запятой (pricePrecision)."""
+    size = to_decimal(info.get(size_key))
+    if size is not None and size > 0:
+        return size
+    digits = to_decimal(info.get(precision_key))
+    if digits is not None and digits >= 0 and digits == digits.to_integral_value():
+        return Decimal(1).scaleb(-int(digits))
+    return None
+
+
+def _positive(info, *keys):
+    for key in keys:
+        value = to_decimal(info.get(key))
+        if value is not None and value > 0:
+            return value
+    return None
+
+
+@dataclass(frozen=True)
+class SymbolRules:
+    """Ограничения пары на ордер.
+
+    tick - шаг цены, step - шаг количества (None - не ограничен),
+    min_quantity и min_notional - минимальные количество и сумма ордера.
+    """
+    symbol: str
+    tick: Decimal = DEFAULT_TICK
+    step: Decimal | None = None
+    min_quantity: Decimal | None = None
+    min_notional: Decimal | None = None
+
+    @classmethod
+    def from_api(cls, info):
+        """Правила из записи /api/symbols: шаги берутся из tickSize/stepSize или из числа знаков."""
+        return cls(
+            symbol=info["symbol"],
+            tick=_increment(info, "tickSize", "pricePrecision") or DEFAULT_TICK,
+            step=_increment(info, "stepSize", "quantityPrecision"),
+            min_quantity=_positive(info, "minTradeSize", "minQuantity"),
+            min_notional=_positive(info, "minNotional", "minOrderValue"),
+        )
+
+    def price(self, value, rounding=NEAREST):
+        """Цена по шагу tick."""
+        return snap(to_decimal(value), self.tick, rounding)
+
+    def quantity(self, value):
+        """Количество по шагу step, всегда вниз: ордер не больше заданного."""
+        value = to_decimal(value)
+        return snap(value, self.step, ROUND_FLOOR) if self.step else value
+
+    def check(self, price, quantity):
+        """Причина, по которой биржа отклонит ордер, или None."""
+        if price is None or price <= 0:
+            return f"некорректная цена {price}"
+        if quantity is None or quantity <= 0:
+            return f"некорректное количество {quantity}"
+        if self.min_quantity is not None and quantity < self.min_quantity:
+            return f"количество {quantity} меньше минимального {self.min_quantity}"
+        if self.min_notional is not None and price * quantity < self.min_notional:
+            return f"сумма {price * quantity} меньше минимальной {self.min_notional}"
+        return None
+
+    def prepare(self, price, quantity, rounding=NEAREST):
+        """Цена и количество по шагам пары: (цена, количество, None) или (None, None, причина)."""
+        if to_decimal(price) is None or to_decimal(quantity) is None:
+            return None, None, f"некорректные цена {price} или количество {quantity}"
+        price, quantity = self.price(price, rounding), self.quantity(quantity)
+        reason = self.check(price, quantity)
+        if reason:
+            return None, None, reason
+        return price, quantity, None
+
+
+class PrecisionTable:
+    """Таблица правил пар по /api/symbols, загружается один раз при первом обращении.
+
+    Ответ /api/symbols кэшируется клиентом, поэтому повторные запуски скриптов
+    берут таблицу с диска. Для пар, которых нет в ответе, действуют прежние
+    правила: цена до 4 знаков, количество без ограничений.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self._rules = None
+        self._attempted = None
+        self._missing = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_api(cls, symbols_data):
+        """Таблица из уже полученного ответа /api/symbols."""
+        table = cls()
+        table._rules = cls._parse(symbols_data)
+        return table
+
+    @staticmethod
+    def _parse(symbols_data):
+        return {
+            item["symbol"]: SymbolRules.from_api(item)
+            for item in _result_list(symbols_data)
+            if isinstance(item, dict) and item.get("symbol")
+        }
+
+    def load(self):
+        """Загружает правила с биржи; возвращает количество пар.
+
+        Пустой ответ (сбой /api/symbols) не запоминается: следующая попытка -
+        не раньше чем через RELOAD_INTERVAL секунд, до тех пор действуют
+        правила по умолчанию.
+        """
+        self._attempted = time.monotonic()
+        rules = self._parse(self.client.get(SYMBOLS_ENDPOINT)) if self.client is not None else {}
+        if not rules:
+            log.warning("Не удалось загрузить %s, цены округляются до %d знаков, повтор через %d с",
+                        SYMBOLS_ENDPOINT, DEFAULT_PRICE_DECIMALS, RELOAD_INTERVAL)
+            return 0
+        self._rules = rules
+        return len(rules)
+
+    def _due(self):
+        return self._rules is None and (
+            self._attempted is None or time.monotonic() - self._attempted >= RELOAD_INTERVAL)
+
+    def rules(self, symbol):
+        if self._due():
+            with self._lock:
+                if self._due():
+                    self.load()
+        if self._rules is None:
+            return SymbolRules(symbol)
+        rules = self._rules.get(symbol)
+        if rules is None:
+            if symbol not in self._missing:
+                self._missing.add(symbol)
+                log.warning("Пара %s не найдена в %s, используются правила по умолчанию", symbol, SYMBOLS_ENDPOINT)
+            return SymbolRules(symbol)
+        return rules
+
+    def price(self, symbol, value, rounding=NEAREST):
+        return self.rules(symbol).price(value, rounding)
+
+    def prepare(self, symbol, price, quantity, rounding=NEAREST):
+        return self.rules(symbol).prepare(price, quantity, rounding)
+
+
+def wire(value):
+    """Число для тела запроса: JSON-число, как и до перехода на Decimal.
+
+    Значение уже приведено к шагу пары; float - ближайшее к нему двоичное
+    число, и repr печатает его теми же значащими цифрами (для очень малых и
+    больших значений - в экспоненциальной записи, это тоже число JSON).
+    """
+    return float(to_decimal(value))
@@ -0,0 +1,65 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RateLimiter:
+    """Ограничитель частоты запросов (token bucket), общий для всех потоков.
+
+    rate - запросов в секунду, burst - сколько запросов можно выполнить подряд.
+    При rate <= 0 ограничение отключено, но пауза после 429 соблюдается.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Блокирует поток, пока не появится свободный токен."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Останавливает выдачу токенов всем потокам на seconds секунд (например, после 429)."""
+        with self._lock:
+            until = time.monotonic() + max(0.0, seconds)
+            self._paused_until = max(self._paused_until, until)
+            self._tokens = 0.0
+            self._updated = until
+
+
+def parse_retry_after(value):
+    """Разбирает заголовок Retry-After (секунды или HTTP-дата); None, если его нет."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Экспоненциальная задержка с полным джиттером для попытки attempt (с нуля)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,209 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import requests
+
+from ataix_client import CONFIG_FILE, DEFAULT_ORDERS_PAGE_SIZE, create_client, read_config
+from ataix_log import get_logger, setup_logging
+from history_index import HISTORY_FILE, HistoryIndex
+from order_model import Order, fmt_number
+from order_store import OrderStore
+
+log = get_logger("reconcile")
+
+# Статусы на бирже: открытые ордера и ордера, которые уже не исполнятся
+OPEN_STATUSES = {"new", "partiallyfilled"}
+CLOSED_STATUSES = {"cancelled", "canceled", "rejected", "expired"}
+
+# Событие history.txt об исполненной покупке, как его пишет Step2
+PURCHASE_ACTION = "\nПОКУПКА: "
+
+
+def fetch_snapshot(client, orders, page_size=DEFAULT_ORDERS_PAGE_SIZE):
+    """Снимок ордеров с биржи постраничным списком: {orderID: ордер} или None.
+
+    Листание ограничено самым старым из переданных ордеров и числом страниц,
+    при котором список не дороже запросов по одному. Снимок может быть
+    неполным: недостающие ордера запрашиваются отдельно.
+    """
+    orders = list(orders)
+    created = [o.created for o in orders if o.created]
+    max_pages = len(orders) // page_size + 1
+    return client.list_orders(since=min(created) if created else None, page_size=page_size, max_pages=max_pages)
+
+
+def _fetch_order(client, order_id):
+    """Запрашивает один ордер: (HTTP-статус, данные ордера или None)."""
+    try:
+        response = client.request("GET", f"/api/orders/{order_id}")
+        data = response.json() if response.status_code == 200 else None
+    except (requests.exceptions.RequestException, ValueError):
+        return None, None
+    result = data.get("result") if isinstance(data, dict) else None
+    return response.status_code, result if isinstance(result, dict) else None
+
+
+@dataclass
+class ReconcileReport:
+    """Итог сверки локального хранилища с биржей."""
+    checked: int = 0
+    snapshot: dict = field(default_factory=dict)   # orderID -> ордер с биржи (словарь API)
+    orphaned: list = field(default_factory=list)   # локальные ордера, которых нет или которые закрыты на бирже
+    partial: list = field(default_factory=list)    # закрытые на бирже покупки с частичным исполнением (Order)
+    unsold: list = field(default_factory=list)     # продажи, которых нет или которые закрыты на бирже (Order)
+    missing: list = field(default_factory=list)    # открытые ордера биржи (Order), которых нет в хранилище
+    unknown: list = field(default_factory=list)    # ордера, статус которых не удалось получить
+    adopted: int = 0
+    removed: int = 0
+    kept: int = 0
+
+    def show(self):
+        print(f"[INFO] Проверено локальных ордеров: {self.checked}, получено с биржи: {len(self.snapshot)}")
+        for order in self.orphaned:
+            status = self.snapshot.get(order.order_id, {}).get("status", "не найден")
+            print(f"[ВНИМАНИЕ] Ордер {order.order_id} ({order.symbol}) на бирже: {status}")
+        for order in self.partial:
+            remote = self.snapshot[order.order_id]
+            print(f"[ВНИМАНИЕ] Покупка {order.order_id} ({order.symbol}) закрыта на бирже после частичного "
+                  f"исполнения: {remote.get('cumQuantity')} из {remote.get('quantity')}")
+        for order in self.unsold:
+            remote = self.snapshot.get(order.order_id)
+            if remote is None:
+                print(f"[ВНИМАНИЕ] Продажа {order.order_id} ({order.symbol}) не найдена на бирже. "
+                      f"Ордер остается в хранилище: монеты по нему еще на счете")
+                continue
+            print(f"[ВНИМАНИЕ] Продажа {order.order_id} ({order.symbol}) на бирже: {remote.get('status')}, "
+                  f"продано {remote.get('cumQuantity')} из {remote.get('quantity')}. "
+                  f"Ордер остается в хранилище: непроданный остаток выставит Step4")
+        for order in self.missing:
+            print(f"[ВНИМАНИЕ] Открытый ордер {order.order_id} ({order.symbol}, {order.side}) "
+                  f"есть на бирже, но не отслеживается")
+        for order_id in self.unknown:
+            print(f"[ERROR] Не удалось получить статус ордера {order_id}")
+        print(f"[INFO] Удалено из хранилища: {self.removed}, добавлено: {self.adopted}, "
+              f"оставлено как исполненные: {self.kept}")
+
+
+def write_purchase(index, order, history_file=HISTORY_FILE):
+    """Дописывает в history_file строку "ПОКУПКА:" в формате Step2, если ее еще нет в index."""
+    if index.contains(PURCHASE_ACTION, order.order_id):
+        return False
+    with open(history_file, "a", encoding="utf-8") as file:
+        file.write(
+            f"{PURCHASE_ACTION} OrderID {order.order_id}, "
+            f"цена {fmt_number(order.price)}, "
+            f"кол-во {fmt_number(order.quantity)}, "
+            f"символ {order.symbol}, "
+            f"время {order.created}, "
+            f"originalID {order.original_id}, "
+            f"комиссия {fmt_number(order.cum_commission)}\n"
+        )
+    index.add(PURCHASE_ACTION, order.order_id)
+    return True
+
+
+def reconcile(client, store, adopt=False, dry_run=False, history_file=HISTORY_FILE):
+    """Сверяет хранилище с биржей одним проходом и исправляет расхождения.
+
+    Активные локальные ордера (не filled) сверяются со списком ордеров биржи;
+    чего в списке нет, запрашивается по одному. Покупки, которых на бирже
+    нет или которые там отменены, удаляются из хранилища; отмененные после
+    частичного исполнения остаются как исполненные на купленное количество
+    по средней цене (со строкой "ПОКУПКА:" в history_file), чтобы Step3 их
+    продал. Продажи не удаляются никогда: монеты по ним еще на счете, и
+    отмененную продажу (например, после сбоя между отменой и новым ордером
+    в Step4) Step4 выставит заново на непроданный остаток. Открытые ордера биржи,
+    которых нет локально (например, после сбоя между созданием ордера и
+    записью), добавляются только при adopt=True - биржа не отличает их от
+    ордеров, выставленных вручную. Исполненные ордера не трогаем: их
+    обрабатывают сканеры шагов, которые пишут историю.
+    """
+    local = {o.order_id: o for o in store.all()}
+    active = {i: o for i, o in local.items() if o.status != "filled"}
+    report = ReconcileReport(checked=len(active))
+
+    snapshot = fetch_snapshot(client, active.values())
+    report.snapshot = dict(snapshot or {})
+
+    not_listed = [i for i in active if i not in report.snapshot]
+    if not_listed:
+        with ThreadPoolExecutor(max_workers=min(client.max_workers, len(not_listed))) as pool:
+            for order_id, (status_code, result) in zip(not_listed, pool.map(lambda i: _fetch_order(client, i), not_listed)):
+                if result is not None:
+                    report.snapshot[order_id] = result
+                elif status_code == 404:
+                    order = active[order_id]
+                    (report.unsold if order.side == "sell" else report.orphaned).append(order)
+                else:
+                    report.unknown.append(order_id)
+
+    for order_id, order in active.items():
+        remote = report.snapshot.get(order_id)
+        if remote and str(remote.get("status", "")).lower() in CLOSED_STATUSES:
+            if order.side == "sell":
+                report.unsold.append(order)
+            elif Order.from_api(remote).cum_quantity > 0:
+                report.partial.append(order)
+            else:
+                report.orphaned.append(order)
+
+    # Неотслеживаемые ордера видны только в полном списке биржи
+    if snapshot is not None:
+        report.missing = [
+            Order.from_api(o) for i, o in snapshot.items()
+            if i not in local and str(o.get("status", "")).lower() in OPEN_STATUSES
+        ]
+
+    if dry_run:
+        return report
+
+    with store.transaction():
+        for order in report.orphaned:
+            if store.remove(order.order_id):
+                report.removed += 1
+        for order in report.partial:
+            # Исполненная часть остается в хранилище как исполненная покупка по средней цене сделки
+            order.update(report.snapshot[order.order_id])
+            order.status = "filled"
+            order.quantity = order.cum_quantity
+            order.price = order.fill_price
+            store.put(order)
+            report.kept += 1
+        if adopt:
+            for order in report.missing:
+                order.reconciled = True
+                store.add(order)
+                report.adopted += 1
+
+    # Как и в Step2, покупка попадает в историю после записи в хранилище
+    if report.partial:
+        index = HistoryIndex(history_file)
+        for order in report.partial:
+            write_purchase(index, order, history_file)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка хранилища ордеров с биржей")
+    parser.add_argument("--adopt", action="store_true", help="добавить в хранилище открытые ордера биржи, которых в нем нет")
+    parser.add_argument("--dry-run", action="store_true", help="только показать расхождения")
+    args = parser.parse_args()
+
+    config = read_config(CONFIG_FILE)
+    setup_logging(config)
+    if not config.get("api_key"):
+        sys.exit("Ошибка: API-ключ не найден в config.json")
+
+    client = create_client(config["api_key"])
+    store = OrderStore()
+    try:
+        reconcile(client, store, adopt=args.adopt, dry_run=args.dry_run).show()
+    finally:
+        client.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+
+from ataix_log import get_logger
+from pnl import GroupTotals, cycle_totals, percent
+
+# Константы
+REPORT_DB = "report_checkpoint.db"
+
+log = get_logger("report")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS groups (
+    originalID TEXT PRIMARY KEY,
+    symbol     TEXT,
+    buys       INTEGER NOT NULL DEFAULT 0,
+    sells      INTEGER NOT NULL DEFAULT 0,
+    spent      REAL NOT NULL DEFAULT 0,
+    income     REAL NOT NULL DEFAULT 0,
+    fees       REAL NOT NULL DEFAULT 0,
+    turnover   REAL NOT NULL DEFAULT 0,
+    first      TEXT,
+    last       TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    originalID TEXT NOT NULL,
+    event      TEXT,
+    orderID    TEXT,
+    price      REAL,
+    quantity   REAL,
+    symbol     TEXT,
+    time       TEXT,
+    commission REAL
+);
+CREATE INDEX IF NOT EXISTS idx_events_original ON events (originalID, time);
+"""
+
+# Итоги новой пачки прибавляются к сохраненным; переписываются только затронутые originalID
+_UPSERT_GROUP = """
+INSERT INTO groups (originalID, symbol, buys, sells, spent, income, fees, turnover, first, last)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(originalID) DO UPDATE SET
+    symbol = excluded.symbol,
+    buys = buys + excluded.buys,
+    sells = sells + excluded.sells,
+    spent = spent + excluded.spent,
+    income = income + excluded.income,
+    fees = fees + excluded.fees,
+    turnover = turnover + excluded.turnover,
+    first = min(first, excluded.first),
+    last = max(last, excluded.last)
+"""
+
+_INSERT_EVENT = "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Сводки по закрытым циклам: символы в порядке появления, дни - по дате закрытия
+_ROLLUPS = {
+    "symbol": ("symbol", "MIN(rowid)"),
+    "day": ("substr(last, 1, 10)", "key"),
+}
+
+
+def _event_row(order):
+    return (order["originalID"], order["событие"], order["OrderID"], order["цена"], order["кол-во"],
+            order["символ"], order["время"].isoformat(timespec="milliseconds"), order["комиссия"])
+
+
+class ReportStore:
+    """Контрольная точка отчета во встроенной базе SQLite.
+
+    Хранит смещение в history.txt, итоги по originalID (количество покупок
+    и продаж, суммы, символ, первое и последнее время) и разобранные события.
+    Новые строки истории дописываются, а итоги обновляются только для
+    затронутых originalID, поэтому повторный отчет не переписывает то, что
+    уже сохранено.
+    """
+
+    def __init__(self, path=REPORT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def reset(self, history_path):
+        """Очищает контрольную точку для пересчета history_path с начала."""
+        with self.transaction():
+            self._conn.execute("DELETE FROM events")
+            self._conn.execute("DELETE FROM groups")
+            self._conn.execute("DELETE FROM meta")
+            self._set_meta("history", os.path.abspath(history_path))
+            self._set_meta("offset", 0)
+
+    def position(self, history_path):
+        """Смещение, с которого читать history_path; если история заменена или обрезана - 0 и пустая точка."""
+        offset = int(self._meta("offset") or 0)
+        if self._meta("history") != os.path.abspath(history_path) or os.path.getsize(history_path) < offset:
+            self.reset(history_path)
+            return 0
+        return offset
+
+    def add(self, events, offset):
+        """Сохраняет пачку разобранных событий и смещение после нее одной транзакцией."""
+        with self.transaction():
+            if events:
+                self._conn.executemany(_INSERT_EVENT, map(_event_row, events))
+                self._conn.executemany(_UPSERT_GROUP, GroupTotals.from_events(events).rows())
+            self._set_meta("offset", offset)
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM groups").fetchone()[0]
+
+    def sections(self):
+        """Блоки отчета в порядке появления originalID: (originalID, события по времени, итоги).
+
+        События читаются одним курсором по индексу, в памяти только текущий
+        originalID - расход памяти не зависит от длины истории.
+        """
+        rows = self._conn.execute(
+            "SELECT g.originalID, g.buys, g.sells, g.spent, g.income, g.fees, g.turnover, "
+            "e.event, e.orderID, e.price, e.quantity, e.symbol, e.time, e.commission "
+            "FROM groups g JOIN events e ON e.originalID = g.originalID ORDER BY g.rowid, e.time, e.rowid")
+        for originalID, group in groupby(rows, key=itemgetter(0)):
+            group = list(group)
+            orders = [
+                {"событие": row[7], "OrderID": row[8], "цена": row[9], "кол-во": row[10],
+                 "символ": row[11], "время": row[12], "комиссия": row[13]}
+                for row in group
+            ]
+            yield originalID, orders, cycle_totals(*group[0][1:7])
+
+    def rollup(self, by):
+        """Сводка по закрытым (сбалансированным) циклам: by - "symbol" или "day"."""
+        key, order = _ROLLUPS[by]
+        rows = self._conn.execute(
+            f"SELECT {key} AS key, COUNT(*), SUM(spent), SUM(income - spent), SUM(fees), SUM(turnover) "
+            f"FROM groups WHERE buys = sells GROUP BY key ORDER BY {order}")
+        return [
+            {"key": key, "cycles": cycles, "profit": profit, "fees": fees, "turnover": turnover,
+             "percent": percent(profit, spent)}
+            for key, cycles, spent, profit, fees, turnover in rows
+        ]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,327 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+from order_model import parse_time
+from precision import DOWN, NEAREST, UP, SymbolRules, apply_pct, to_decimal
+
+# Значения по умолчанию повторяют ручной режим: шаг 1%
+DEFAULT_STEP_PCT = 1.0
+DEFAULT_MAX_STEPS = 10
+DEFAULT_MIN_INTERVAL = 300
+
+# Пересоздание по стакану: предельное изменение цены за одно пересоздание
+# и срок жизни котировок
+DEFAULT_MAX_STEP_PCT = 5.0
+DEFAULT_BOOK_MAX_AGE = 5.0
+PLACEMENTS = ("join", "improve", "cross")
+
+# Наценка продажи над ценой покупки и комиссия биржи за сделку, %
+DEFAULT_MARKUP_PCT = 2.0
+DEFAULT_FEE_PCT = 0.1
+
+
+def order_age(order, now=None):
+    """Возраст ордера в секундах по полю created (ISO-8601) или None."""
+    created_at = parse_time(order.created)
+    if created_at is None:
+        return None
+    return (now if now is not None else time.time()) - created_at
+
+
+@dataclass
+class RepriceRule:
+    """Правило пересоздания неисполненного ордера без участия пользователя.
+
+    side - "buy" (цена повышается, не выше price_caps) или "sell"
+    (цена понижается, не ниже price_caps). price_caps - {символ: граница}.
+    Новые цены приводятся к шагу цены пары из precision (PrecisionTable);
+    без таблицы - к 4 знакам, как раньше.
+    """
+    side: str
+    step_pct: float = DEFAULT_STEP_PCT
+    max_steps: int = DEFAULT_MAX_STEPS
+    min_interval: float = DEFAULT_MIN_INTERVAL
+    price_caps: dict = field(default_factory=dict)
+    dry_run: bool = False
+    precision: object = None
+
+    @classmethod
+    def from_config(cls, side, options, dry_run=False, precision=None):
+        cap_key = "max_price" if side == "buy" else "min_price"
+        return cls(
+            side=side,
+            step_pct=float(options.get("step_pct", DEFAULT_STEP_PCT)),
+            max_steps=int(options.get("max_steps", DEFAULT_MAX_STEPS)),
+            min_interval=float(options.get("min_interval", DEFAULT_MIN_INTERVAL)),
+            price_caps={k: float(v) for k, v in options.get(cap_key, {}).items()},
+            dry_run=dry_run,
+            precision=precision,
+        )
+
+    @property
+    def direction(self):
+        """1 - цена пересоздания растет (покупка), -1 - снижается (продажа)."""
+        return 1 if self.side == "buy" else -1
+
+    def rules(self, symbol):
+        return self.precision.rules(symbol) if self.precision is not None else SymbolRules(symbol)
+
+    def snap(self, symbol, price, rounding=NEAREST):
+        """Цена по шагу цены пары."""
+        return float(self.rules(symbol).price(price, rounding))
+
+    def check(self, order, now=None):
+        """Причина не пересоздавать ордер сейчас или None."""
+        if order.reprice_count >= self.max_steps:
+            return f"достигнут предел пересозданий ({self.max_steps})"
+
+        age = order_age(order, now)
+        if age is not None and age < self.min_interval:
+            return f"ордер выставлен {int(age)} с назад, минимум {int(self.min_interval)} с"
+        return None
+
+    def bound(self, order, price, new_price):
+        """Ограничивает новую цену границей пары: (цена, None) или (None, причина)."""
+        cap = self.price_caps.get(order.symbol)
+        if cap is not None:
+            # Граница тоже по шагу цены, с округлением внутрь допустимого диапазона
+            cap = self.snap(order.symbol, cap, DOWN if self.side == "buy" else UP)
+            new_price = min(new_price, cap) if self.side == "buy" else max(new_price, cap)
+            if self.direction * (new_price - price) <= 0:
+                return None, f"цена уже на границе {cap}"
+        return new_price, None
+
+    def next_price(self, order, now=None):
+        """Новая цена ордера или (None, причина), если пересоздавать не нужно."""
+        reason = self.check(order, now)
+        if reason:
+            return None, reason
+
+        # Округление от старой цены: шаг меньше тика не оставляет цену прежней
+        new_price = self.snap(order.symbol, apply_pct(order.price, self.direction * self.step_pct),
+                              UP if self.side == "buy" else DOWN)
+        return self.bound(order, order.price, new_price)
+
+
+@dataclass
+class MarkupRule:
+    """Цена продажи исполненной покупки без участия пользователя.
+
+    markup_pct - наценка над ценой исполнения, symbol_pct - {символ: наценка}
+    для отдельных пар. Цена не опускается ниже безубыточной: стоимость
+    покупки с ее фактической комиссией, комиссия продажи fee_pct и
+    минимальная прибыль min_profit_pct.
+    """
+    markup_pct: float = DEFAULT_MARKUP_PCT
+    symbol_pct: dict = field(default_factory=dict)
+    fee_pct: float = DEFAULT_FEE_PCT
+    min_profit_pct: float = 0.0
+    dry_run: bool = False
+
+    @classmethod
+    def from_config(cls, options, dry_run=False):
+        return cls(
+            markup_pct=float(options.get("markup_pct", DEFAULT_MARKUP_PCT)),
+            symbol_pct={k: float(v) for k, v in options.get("markup", {}).items()},
+            fee_pct=float(options.get("fee_pct", DEFAULT_FEE_PCT)),
+            min_profit_pct=float(options.get("min_profit_pct", 0.0)),
+            dry_run=dry_run,
+        )
+
+    def markup(self, symbol):
+        return self.symbol_pct.get(symbol, self.markup_pct)
+
+    def min_price(self, order):
+        """Безубыточная цена продажи всего количества покупки с прибылью min_profit_pct."""
+        quantity = to_decimal(order.quantity)
+        cost = to_decimal(order.fill_price) * quantity + to_decimal(order.cum_commission)
+        return cost * (1 + to_decimal(self.min_profit_pct) / 100) / (quantity * (1 - to_decimal(self.fee_pct) / 100))
+
+    def sell_price(self, order):
+        """Цена продажи до приведения к шагу цены: (цена, None), (цена, пояснение),
+        если наценка поднята до безубыточной, или (None, причина).
+        """
+        if order.quantity <= 0 or order.fill_price <= 0:
+            return None, "нет цены или количества исполнения"
+        markup = self.markup(order.symbol)
+        price = apply_pct(order.fill_price, markup)
+        floor = self.min_price(order)
+        if price < floor:
+            return floor, f"наценка {markup}% не покрывает комиссии, цена поднята до {floor:.8f}"
+        return price, None
+
+
+@dataclass
+class Quote:
+    """Котировка пары: лучшие цены, последняя сделка и, если источник их дает, уровни стакана.
+
+    bids/asks - списки (цена, объем) от лучшей цены.
+    """
+    bid: float | None = None
+    ask: float | None = None
+    last: float | None = None
+    bids: list = field(default_factory=list)
+    asks: list = field(default_factory=list)
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _levels(value):
+    """Уровни стакана из [[цена, объем], ...] или [{"price", "quantity"}, ...]."""
+    levels = []
+    for level in value or []:
+        if isinstance(level, dict):
+            level = (level.get("price"), level.get("quantity"))
+        if isinstance(level, (list, tuple)) and len(level) >= 2:
+            price, quantity = _to_float(level[0]), _to_float(level[1])
+            if price is not None and quantity is not None:
+                levels.append((price, quantity))
+    return levels
+
+
+class PricesSource:
+    """Источник котировок по /api/prices: все пары одним запросом.
+
+    Подойдет любой объект с методом fetch() -> {символ: Quote}, например
+    источник стакана по WebSocket.
+    """
+
+    def __init__(self, client, endpoint="/api/prices"):
+        self.client = client
+        self.endpoint = endpoint
+
+    def fetch(self):
+        data = self.client.get(self.endpoint)
+        items = data.get("result") if isinstance(data, dict) else data
+        quotes = {}
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict) and item.get("symbol"):
+                quotes[item["symbol"]] = Quote(
+                    bid=_to_float(item.get("bid")),
+                    ask=_to_float(item.get("ask")),
+                    last=_to_float(item.get("lastTrade")),
+                    bids=_levels(item.get("bids")),
+                    asks=_levels(item.get("asks")),
+                )
+        return quotes
+
+
+class BookMirror:
+    """Локальное зеркало котировок, которое обновляется из источника не чаще max_age секунд."""
+
+    def __init__(self, source, max_age=DEFAULT_BOOK_MAX_AGE):
+        self.source = source
+        self.max_age = max_age
+        self._quotes = {}
+        self._updated = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.RLock()
+
+    def refresh(self):
+        """Загружает свежие котировки; возвращает количество пар."""
+        with self._refresh_lock:
+            quotes = self.source.fetch()
+            with self._lock:
+                self._quotes.update(quotes)
+                self._updated = time.monotonic()
+            return len(quotes)
+
+    def update(self, symbol, quote):
+        """Обновление от источника, который сам присылает изменения."""
+        with self._lock:
+            self._quotes[symbol] = quote
+
+    def _stale(self):
+        with self._lock:
+            return self._updated is None or time.monotonic() - self._updated > self.max_age
+
+    def quote(self, symbol):
+        if self._stale():
+            with self._refresh_lock:
+                # Пока ждали блокировку, котировки мог обновить другой поток
+                if self._stale():
+                    self.refresh()
+        with self._lock:
+            return self._quotes.get(symbol)
+
+
+@dataclass
+class BookRepricer(RepriceRule):
+    """Пересоздание по стакану: новая цена ставится к лучшей цене, а не лесенкой по step_pct.
+
+    placement: "join" - встать на лучшую цену своей стороны, "improve" - на
+    шаг цены лучше нее (но не через спред), "cross" - на лучшую встречную
+    цену (с учетом объема, если источник дает уровни стакана). За одно
+    пересоздание цена меняется не больше чем на max_step_pct; если котировки
+    нет, используется обычный шаг step_pct. tick задает шаг цены явно,
+    по умолчанию берется шаг пары.
+    """
+    mirror: BookMirror | None = None
+    placement: str = "improve"
+    tick: float | None = None
+    max_step_pct: float = DEFAULT_MAX_STEP_PCT
+
+    @classmethod
+    def from_config(cls, side, options, dry_run=False, mirror=None, precision=None):
+        rule = super().from_config(side, options, dry_run, precision)
+        rule.mirror = mirror
+        rule.placement = options.get("placement", "improve")
+        if rule.placement not in PLACEMENTS:
+            raise ValueError(f"placement должен быть одним из {PLACEMENTS}")
+        rule.tick = float(options["tick"]) if options.get("tick") else None
+        rule.max_step_pct = float(options.get("max_step_pct", DEFAULT_MAX_STEP_PCT))
+        return rule
+
+    def target_price(self, quote, quantity, tick):
+        """Цена у лучшей котировки для ордера стороны side или None."""
+        if self.side == "buy":
+            touch, opposite, levels = quote.bid, quote.ask, quote.asks
+        else:
+            touch, opposite, levels = quote.ask, quote.bid, quote.bids
+
+        if self.placement == "cross":
+            # Идем по уровням встречной стороны, пока объем не покроет ордер
+            filled = 0.0
+            for price, size in levels:
+                filled += size
+                if filled >= quantity:
+                    return price
+            return opposite if opposite is not None else quote.last
+
+        if touch is None:
+            return quote.last
+        if self.placement == "improve":
+            improved = touch + self.direction * tick
+            if opposite is None or self.direction * (opposite - improved) > 0:
+                return improved
+        return touch
+
+    def next_price(self, order, now=None):
+        reason = self.check(order, now)
+        if reason:
+            return None, reason
+
+        quote = self.mirror.quote(order.symbol) if self.mirror else None
+        tick = self.tick or float(self.rules(order.symbol).tick)
+        target = self.target_price(quote, order.quantity, tick) if quote else None
+        if target is None:
+            return super().next_price(order, now)
+
+        price = order.price
+        # Зеркало не отличает наш ордер от чужих: если лучшая цена своей стороны -
+        # это мы сами, "improve" перебивал бы себя на шаг цены каждый проход
+        touch = quote.bid if self.side == "buy" else quote.ask
+        if self.placement != "cross" and touch is not None and abs(touch - price) < tick / 2:
+            return None, f"ордер уже на лучшей цене ({touch})"
+        if self.direction * (target - price) <= 0:
+            return None, f"ордер уже на лучшей цене ({target})"
+
+        limit = price * (1 + self.direction * self.max_step_pct / 100)
+        target = min(target, limit) if self.side == "buy" else max(target, limit)
+        return self.bound(order, price, self.snap(order.symbol, target))